@@ -3,16 +3,12 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 
 from alembic import context
-from src.config import settings
-from src.database import Base
+from src.database import Base, database_url
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option(
-    "sqlalchemy.url",
-    f"postgresql+psycopg2://{settings.db_username}:{settings.db_password}@{settings.db_hostname}:{settings.db_port}/{settings.db_name}",
-)
+config.set_main_option("sqlalchemy.url", database_url(driver="psycopg2"))
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
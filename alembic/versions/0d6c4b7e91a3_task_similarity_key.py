@@ -0,0 +1,55 @@
+# trunk-ignore(ruff/D400)
+# trunk-ignore(ruff/D415)
+"""task similarity key
+
+Revision ID: 0d6c4b7e91a3
+Revises: e3b9a6f2c170
+Create Date: 2026-10-18 13:05:12.874301
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0d6c4b7e91a3"
+down_revision = "e3b9a6f2c170"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.add_column(
+        "tasks",
+        sa.Column(
+            "similarity_key",
+            sa.String(),
+            sa.Computed(
+                "btrim(regexp_replace(lower(title || ' ' || coalesce(description, '')),"
+                " '[^[:alnum:]]+', ' ', 'g'))",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_user_id_similarity_key",
+            "tasks",
+            ["user_id", "similarity_key"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"similarity_key": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_user_id_similarity_key",
+            table_name="tasks",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("tasks", "similarity_key")
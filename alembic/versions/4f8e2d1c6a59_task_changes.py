@@ -0,0 +1,77 @@
+# trunk-ignore(ruff/D400)
+# trunk-ignore(ruff/D415)
+"""task changes
+
+Revision ID: 4f8e2d1c6a59
+Revises: 0d6c4b7e91a3
+Create Date: 2026-10-18 13:48:31.552907
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4f8e2d1c6a59"
+down_revision = "0d6c4b7e91a3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence("task_change_seq")))
+    op.add_column(
+        "tasks",
+        sa.Column(
+            "change_seq",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('task_change_seq')"),
+            nullable=False,
+        ),
+    )
+    op.create_table(
+        "task_tombstones",
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "change_seq",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('task_change_seq')"),
+            nullable=False,
+        ),
+        sa.Column(
+            "deleted_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("NOW()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("task_id"),
+    )
+    op.create_index(
+        "ix_task_tombstones_user_id_change_seq",
+        "task_tombstones",
+        ["user_id", "change_seq"],
+        unique=False,
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_user_id_change_seq",
+            "tasks",
+            ["user_id", "change_seq"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_user_id_change_seq",
+            table_name="tasks",
+            postgresql_concurrently=True,
+        )
+    op.drop_index("ix_task_tombstones_user_id_change_seq", table_name="task_tombstones")
+    op.drop_table("task_tombstones")
+    op.drop_column("tasks", "change_seq")
+    op.execute(sa.schema.DropSequence(sa.Sequence("task_change_seq")))
@@ -0,0 +1,84 @@
+# trunk-ignore(ruff/D400)
+# trunk-ignore(ruff/D415)
+"""task query indexes
+
+Revision ID: 5c2f1e8a9d47
+Revises: ba92b48a6dd1
+Create Date: 2026-10-18 10:12:41.208377
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5c2f1e8a9d47"
+down_revision = "ba92b48a6dd1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_user_id_due_date",
+            "tasks",
+            ["user_id", "due_date", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_tasks_user_id_created_at",
+            "tasks",
+            ["user_id", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_tasks_user_id_title",
+            "tasks",
+            ["user_id", "title", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_tasks_user_id_completed_at",
+            "tasks",
+            ["user_id", "completed_at"],
+            unique=False,
+            postgresql_where=sa.text("is_completed"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_tasks_due_date",
+            "tasks",
+            ["due_date"],
+            unique=False,
+            postgresql_where=sa.text("due_date IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_due_date", table_name="tasks", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_tasks_user_id_completed_at",
+            table_name="tasks",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_tasks_user_id_title", table_name="tasks", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_tasks_user_id_created_at",
+            table_name="tasks",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_tasks_user_id_due_date",
+            table_name="tasks",
+            postgresql_concurrently=True,
+        )
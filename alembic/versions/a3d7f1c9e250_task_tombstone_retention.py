@@ -0,0 +1,46 @@
+# trunk-ignore(ruff/D400)
+# trunk-ignore(ruff/D415)
+"""task tombstone retention
+
+Revision ID: a3d7f1c9e250
+Revises: e5a2c8d4f713
+Create Date: 2026-10-18 19:12:47.208315
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3d7f1c9e250"
+down_revision = "e5a2c8d4f713"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_tombstone_horizons",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("change_seq", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_task_tombstones_deleted_at",
+            "task_tombstones",
+            ["deleted_at"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_task_tombstones_deleted_at",
+            table_name="task_tombstones",
+            postgresql_concurrently=True,
+        )
+    op.drop_table("task_tombstone_horizons")
@@ -0,0 +1,44 @@
+# trunk-ignore(ruff/D400)
+# trunk-ignore(ruff/D415)
+"""attachment blob store
+
+Revision ID: c1e7a95f3b20
+Revises: b6d03f9e2a84
+Create Date: 2026-10-18 16:05:44.209318
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c1e7a95f3b20"
+down_revision = "b6d03f9e2a84"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("attachments", sa.Column("storage_key", sa.String(), nullable=True))
+    op.add_column("attachments", sa.Column("size", sa.BigInteger(), nullable=True))
+    op.add_column("attachments", sa.Column("content_type", sa.String(), nullable=True))
+    op.add_column(
+        "attachments",
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("NOW()"),
+            nullable=False,
+        ),
+    )
+    op.execute(
+        "UPDATE attachments SET size = coalesce(octet_length(file_attachment), 0)"
+    )
+    op.alter_column("attachments", "size", nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column("attachments", "created_at")
+    op.drop_column("attachments", "content_type")
+    op.drop_column("attachments", "size")
+    op.drop_column("attachments", "storage_key")
@@ -0,0 +1,36 @@
+# trunk-ignore(ruff/D400)
+# trunk-ignore(ruff/D415)
+"""user task count
+
+Revision ID: e3b9a6f2c170
+Revises: 7a41d0c3e6b2
+Create Date: 2026-10-18 12:20:44.310582
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e3b9a6f2c170"
+down_revision = "7a41d0c3e6b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column(
+            "task_count", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+    )
+    op.execute(
+        "UPDATE users SET task_count = counts.task_count "
+        "FROM (SELECT user_id, count(*) AS task_count FROM tasks GROUP BY user_id) "
+        "AS counts WHERE users.id = counts.user_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "task_count")
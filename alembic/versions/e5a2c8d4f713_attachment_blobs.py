@@ -0,0 +1,92 @@
+# trunk-ignore(ruff/D400)
+# trunk-ignore(ruff/D415)
+"""attachment blobs
+
+Revision ID: e5a2c8d4f713
+Revises: c1e7a95f3b20
+Create Date: 2026-10-18 16:52:19.630471
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e5a2c8d4f713"
+down_revision = "c1e7a95f3b20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "ref_count", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("NOW()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("sha256"),
+    )
+    op.create_index(
+        "ix_blobs_unreferenced",
+        "blobs",
+        ["sha256"],
+        unique=False,
+        postgresql_where=sa.text("ref_count = 0"),
+    )
+    op.add_column(
+        "attachments",
+        sa.Column("blob_sha256", sa.String(length=64), nullable=True),
+    )
+    op.create_foreign_key(
+        "attachments_blob_sha256_fkey",
+        "attachments",
+        "blobs",
+        ["blob_sha256"],
+        ["sha256"],
+    )
+    op.create_index(
+        "ix_attachments_blob_sha256", "attachments", ["blob_sha256"], unique=False
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION attachments_blob_refs() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE blobs SET ref_count = ref_count + 1
+                WHERE sha256 = NEW.blob_sha256;
+            ELSE
+                UPDATE blobs SET ref_count = ref_count - 1
+                WHERE sha256 = OLD.blob_sha256;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER attachments_blob_refs
+        AFTER INSERT OR DELETE ON attachments
+        FOR EACH ROW EXECUTE FUNCTION attachments_blob_refs()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER attachments_blob_refs ON attachments")
+    op.execute("DROP FUNCTION attachments_blob_refs()")
+    op.drop_index("ix_attachments_blob_sha256", table_name="attachments")
+    op.drop_constraint(
+        "attachments_blob_sha256_fkey", "attachments", type_="foreignkey"
+    )
+    op.drop_column("attachments", "blob_sha256")
+    op.drop_index("ix_blobs_unreferenced", table_name="blobs")
+    op.drop_table("blobs")
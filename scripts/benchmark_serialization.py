@@ -0,0 +1,80 @@
+"""Compare the pydantic response path with the orjson row serializer.
+
+Run from the repository root with the app's environment loaded:
+
+    python -m scripts.benchmark_serialization --rows 1000 --repeat 20
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from src.dtos import dto_misc, dto_tasks
+from src.models.tasks import TASK_COLUMNS
+from src.serializers import serialize_rows
+
+PageResponse = dto_misc.TaskPageResponse[dto_tasks.TaskPartialResponse]
+
+
+def make_rows(count: int):
+    now = datetime.now(timezone.utc)
+    data = [
+        (
+            id,
+            f"task {id}",
+            f"description for task {id}",
+            now,
+            now,
+            now + timedelta(days=id % 30) if id % 4 else None,
+            None,
+            False,
+            1,
+        )
+        for id in range(1, count + 1)
+    ]
+    keys = [column.key for column in TASK_COLUMNS]
+    return IteratorResult(SimpleResultMetaData(keys), iter(data)).all()
+
+
+def pydantic_path(rows):
+    # What FastAPI does for a response_model: validate, encode, json.dumps
+    content = {"status": "success", "data": {"tasks": rows, "next_cursor": None}}
+    response = PageResponse.parse_obj(content)
+    return json.dumps(
+        jsonable_encoder(response, exclude_unset=True),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+def orjson_path(rows):
+    content = {"status": "success", "data": {"tasks": rows, "next_cursor": None}}
+    content["data"]["tasks"] = serialize_rows(rows)
+    return ORJSONResponse(content).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    assert json.loads(pydantic_path(rows)) == json.loads(orjson_path(rows))
+    results = {}
+    for name, path in (("pydantic", pydantic_path), ("orjson", orjson_path)):
+        timings = timeit.repeat(
+            lambda path=path: path(rows), number=1, repeat=args.repeat
+        )
+        results[name] = min(timings)
+        print(f"{name:>8}: {results[name] * 1000:8.2f} ms per {args.rows} rows")
+    print(f" speedup: {results['pydantic'] / results['orjson']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import hashlib
+import logging
+import time
+from typing import Optional
+
+import orjson
+
+from redis.exceptions import RedisError
+from src.config import settings
+from src.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+def version_key(user_id: int) -> str:
+    return f"tasks:cache:{user_id}:version"
+
+
+async def user_version(user_id: int) -> Optional[str]:
+    # Entries are keyed by the user's version, so bumping it on every write
+    # orphans everything cached before it; they expire on their own TTL
+    client = get_async_redis()
+    try:
+        version = await client.get(version_key(user_id))
+        if version is None:
+            # Start from the clock rather than 0 so a lost version key can
+            # never line up with entries cached under an earlier one
+            await client.set(version_key(user_id), time.time_ns(), nx=True)
+            version = await client.get(version_key(user_id))
+        return version.decode()
+    except RedisError as e:
+        logger.warning(f"Task cache unavailable: {e}")
+        return None
+
+
+async def bump_user_version(user_id: int):
+    try:
+        await get_async_redis().incr(version_key(user_id))
+    except RedisError as e:
+        logger.warning(f"Could not invalidate task cache for user {user_id}: {e}")
+
+
+async def task_cache_key(user_id: int, read: str, *params) -> Optional[str]:
+    version = await user_version(user_id)
+    if version is None:
+        return None
+    digest = hashlib.sha1(orjson.dumps(params)).hexdigest()
+    return f"tasks:cache:{user_id}:{version}:{read}:{digest}"
+
+
+async def get(key: str) -> Optional[bytes]:
+    try:
+        return await get_async_redis().get(key)
+    except RedisError as e:
+        logger.warning(f"Task cache unavailable: {e}")
+        return None
+
+
+async def set(key: str, value: bytes):
+    try:
+        await get_async_redis().setex(key, settings.cache_expiry_time, value)
+    except RedisError as e:
+        logger.warning(f"Could not cache {key}: {e}")
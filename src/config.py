@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 from pydantic import BaseSettings
 
 
@@ -24,6 +26,55 @@ class Settings(BaseSettings):
     redirect_url: str
     max_tasks: int
     cache_expiry_time: int
+    redis_url: str = "redis://redis:6379/0"
+    events_heartbeat_interval: float = 15.0
+    idempotency_ttl: int = 86400
+    idempotency_lock_ttl: int = 60
+    idempotency_poll_interval: float = 0.1
+    tasks_page_size: int = 50
+    tasks_max_page_size: int = 200
+    tasks_bulk_limit: int = 100
+    tasks_export_batch_size: int = 1000
+    tasks_import_batch_size: int = 500
+    similarity_threshold: float = 0.5
+    archive_after_days: int = 90
+    archive_batch_size: int = 500
+    archive_interval: int = 60 * 60
+    tombstone_retention_days: int = 30
+    tombstone_batch_size: int = 500
+    tombstone_prune_interval: int = 60 * 60
+    blob_store: str = "local"
+    blob_local_path: str = "attachments"
+    blob_chunk_size: int = 1024 * 1024
+    blob_part_size: int = 8 * 1024 * 1024
+    max_attachment_size: int = 25 * 1024 * 1024
+    blob_gc_interval: int = 60 * 60
+    blob_gc_batch_size: int = 500
+    s3_bucket: str = "attachments"
+    s3_endpoint_url: Optional[str] = None
+    s3_region: str = "us-east-1"
+    s3_access_key_id: Optional[str] = None
+    s3_secret_access_key: Optional[str] = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout: int = 30000
+    db_application_name: str = "todolist"
+    db_replica_url: Optional[str] = None
+    db_replica_max_lag: float = 5.0
+    db_replica_check_interval: int = 10
+    db_replica_connect_timeout: float = 2.0
+    request_log_sample_rate: float = 0.1
+    request_log_max_body_bytes: int = 1024
+    sql_profile_sample_rate: float = 0.0
+    sql_profile_header: str = "X-SQL-Profile"
+    sql_profile_buffer_size: int = 200
+    sql_profile_slowest_statements: int = 5
+    admin_emails: List[str] = []
+    log_level: str = "INFO"
+    log_levels: Dict[str, str] = {}
 
     class Config:
         env_file = ".env"
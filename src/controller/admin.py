@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, status
+
+from src.handler import admin as handler
+from src.handler.utils import validate_admin
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+validated_admin = Depends(validate_admin)
+
+
+# SQL Profile Endpoint
+@router.get("/sql-profile", status_code=status.HTTP_200_OK)
+def sql_profile(current_user: int = validated_admin):
+    return {"status": "success", "data": handler.sql_profile()}
+
+
+# Database Pool Statistics Endpoint
+@router.get("/db-pool", status_code=status.HTTP_200_OK)
+def db_pool(current_user: int = validated_admin):
+    return {"status": "success", "data": handler.db_pool()}
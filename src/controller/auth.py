@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import get_db
 from src.dtos import dto_misc
@@ -20,7 +20,7 @@ Depend = Depends()
 )
 async def login(
     user_credentials: OAuth2PasswordRequestForm = Depend,
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
 ):
     return await handler.login(user_credentials, db)
 
@@ -32,5 +32,5 @@ async def login_google():
 
 
 @router.get("/login/google/callback", status_code=status.HTTP_202_ACCEPTED)
-async def callback_google(request: Request, db: Session = get_db_session):
+async def callback_google(request: Request, db: AsyncSession = get_db_session):
     return await handler.callback_google(request, db)
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+
+from src import metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+# Prometheus Metrics Endpoint
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    content, media_type = metrics.render()
+    return Response(content=content, media_type=media_type)
@@ -1,14 +1,18 @@
+import logging
 import pickle
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src import metrics
 from src.config import settings
 from src.database import get_db
 from src.dtos import dto_misc, dto_reports
 from src.handler import reports as handler
 from src.handler.utils import validate_user
-from src.redis import redis_client
+from src.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
@@ -20,16 +24,22 @@ validated_user = Depends(validate_user)
     "/count",
     response_model=dto_misc.ReportSingleResponse[dto_reports.CountReportResponse],
 )
-def count_tasks(db: Session = get_db_session, current_user: int = validated_user):
+async def count_tasks(
+    db: AsyncSession = get_db_session, current_user: int = validated_user
+):
     cache_key = f"task_count_report_user_{current_user.id}"
-    cache_data = redis_client.get(cache_key)
+    cache_data = await get_async_redis().get(cache_key)
     if cache_data:
-        print("Cache Hit!")
+        logger.debug("Cache Hit!")
+        metrics.REPORT_CACHE.labels("count", "hit").inc()
         report = pickle.loads(cache_data)
     else:
-        print("Cache Miss!!!")
-        report = handler.count_tasks(db, current_user)
-        redis_client.setex(cache_key, settings.cache_expiry_time, pickle.dumps(report))
+        logger.debug("Cache Miss!!!")
+        metrics.REPORT_CACHE.labels("count", "miss").inc()
+        report = await handler.count_tasks(db, current_user)
+        await get_async_redis().setex(
+            cache_key, settings.cache_expiry_time, pickle.dumps(report)
+        )
     response = {"status": "success", "data": {"report": report}}
     return response
 
@@ -38,16 +48,22 @@ def count_tasks(db: Session = get_db_session, current_user: int = validated_user
     "/average",
     response_model=dto_misc.ReportSingleResponse[dto_reports.AverageReportResponse],
 )
-def average_tasks(db: Session = get_db_session, current_user: int = validated_user):
+async def average_tasks(
+    db: AsyncSession = get_db_session, current_user: int = validated_user
+):
     cache_key = f"task_average_report_user_{current_user.id}"
-    cache_data = redis_client.get(cache_key)
+    cache_data = await get_async_redis().get(cache_key)
     if cache_data:
-        print("Cache Hit!")
+        logger.debug("Cache Hit!")
+        metrics.REPORT_CACHE.labels("average", "hit").inc()
         report = pickle.loads(cache_data)
     else:
-        print("Cache Miss!!!")
-        report = handler.average_tasks(db, current_user)
-        redis_client.setex(cache_key, settings.cache_expiry_time, pickle.dumps(report))
+        logger.debug("Cache Miss!!!")
+        metrics.REPORT_CACHE.labels("average", "miss").inc()
+        report = await handler.average_tasks(db, current_user)
+        await get_async_redis().setex(
+            cache_key, settings.cache_expiry_time, pickle.dumps(report)
+        )
     response = {"status": "success", "data": {"report": report}}
     return response
 
@@ -56,16 +72,22 @@ def average_tasks(db: Session = get_db_session, current_user: int = validated_us
     "/overdue",
     response_model=dto_misc.ReportSingleResponse[dto_reports.OverdueReportResponse],
 )
-def overdue_tasks(db: Session = get_db_session, current_user: int = validated_user):
+async def overdue_tasks(
+    db: AsyncSession = get_db_session, current_user: int = validated_user
+):
     cache_key = f"task_overdue_report_user_{current_user.id}"
-    cache_data = redis_client.get(cache_key)
+    cache_data = await get_async_redis().get(cache_key)
     if cache_data:
-        print("Cache Hit!")
+        logger.debug("Cache Hit!")
+        metrics.REPORT_CACHE.labels("overdue", "hit").inc()
         report = pickle.loads(cache_data)
     else:
-        print("Cache Miss!!!")
-        report = handler.overdue_tasks(db, current_user)
-        redis_client.setex(cache_key, settings.cache_expiry_time, pickle.dumps(report))
+        logger.debug("Cache Miss!!!")
+        metrics.REPORT_CACHE.labels("overdue", "miss").inc()
+        report = await handler.overdue_tasks(db, current_user)
+        await get_async_redis().setex(
+            cache_key, settings.cache_expiry_time, pickle.dumps(report)
+        )
     response = {"status": "success", "data": {"report": report}}
     return response
 
@@ -74,16 +96,22 @@ def overdue_tasks(db: Session = get_db_session, current_user: int = validated_us
     "/max",
     response_model=dto_misc.ReportSingleResponse[dto_reports.DateMaxReportResponse],
 )
-def date_max_tasks(db: Session = get_db_session, current_user: int = validated_user):
+async def date_max_tasks(
+    db: AsyncSession = get_db_session, current_user: int = validated_user
+):
     cache_key = f"task_date_max_report_user_{current_user.id}"
-    cache_data = redis_client.get(cache_key)
+    cache_data = await get_async_redis().get(cache_key)
     if cache_data:
-        print("Cache Hit!")
+        logger.debug("Cache Hit!")
+        metrics.REPORT_CACHE.labels("max", "hit").inc()
         report = pickle.loads(cache_data)
     else:
-        print("Cache Miss!!!")
-        report = handler.date_max_tasks(db, current_user)
-        redis_client.setex(cache_key, settings.cache_expiry_time, pickle.dumps(report))
+        logger.debug("Cache Miss!!!")
+        metrics.REPORT_CACHE.labels("max", "miss").inc()
+        report = await handler.date_max_tasks(db, current_user)
+        await get_async_redis().setex(
+            cache_key, settings.cache_expiry_time, pickle.dumps(report)
+        )
     response = {"status": "success", "data": {"report": report}}
     return response
 
@@ -92,15 +120,21 @@ def date_max_tasks(db: Session = get_db_session, current_user: int = validated_u
     "/day",
     response_model=dto_misc.ReportMultipleResponse[dto_reports.DayTasksReportResponse],
 )
-def day_of_week_tasks(db: Session = get_db_session, current_user: int = validated_user):
+async def day_of_week_tasks(
+    db: AsyncSession = get_db_session, current_user: int = validated_user
+):
     cache_key = f"task_day_of_week_report_user_{current_user.id}"
-    cache_data = redis_client.get(cache_key)
+    cache_data = await get_async_redis().get(cache_key)
     if cache_data:
-        print("Cache Hit!")
+        logger.debug("Cache Hit!")
+        metrics.REPORT_CACHE.labels("day", "hit").inc()
         reports = pickle.loads(cache_data)
     else:
-        print("Cache Miss!!!")
-        reports = handler.day_of_week_tasks(db, current_user)
-        redis_client.setex(cache_key, settings.cache_expiry_time, pickle.dumps(reports))
+        logger.debug("Cache Miss!!!")
+        metrics.REPORT_CACHE.labels("day", "miss").inc()
+        reports = await handler.day_of_week_tasks(db, current_user)
+        await get_async_redis().setex(
+            cache_key, settings.cache_expiry_time, pickle.dumps(reports)
+        )
     response = {"status": "success", "data": {"reports": reports}}
     return response
@@ -1,17 +1,35 @@
 from typing import Optional
 
-from fastapi import APIRouter, Depends, File, UploadFile, status
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src import cache, metrics
+from src.config import settings
 from src.database import get_db
 from src.dtos import dto_misc, dto_tasks
 from src.handler import tasks as handler
 from src.handler.utils import validate_user
+from src.idempotency import IdempotentRoute
+from src.serializers import serialize_row, serialize_rows
 
-router = APIRouter(prefix="/tasks", tags=["Tasks"])
+router = APIRouter(prefix="/tasks", tags=["Tasks"], route_class=IdempotentRoute)
 
 get_db_session = Depends(get_db)
 validated_user = Depends(validate_user)
+file = File(...)
+page_limit = Query(settings.tasks_page_size, ge=1, le=settings.tasks_max_page_size)
+change_cursor = Query(0, ge=0)
+export_format = Query("ndjson", regex="^(ndjson|csv)$")
 
 
 # Create Task Endpoint
@@ -22,11 +40,59 @@ validated_user = Depends(validate_user)
 )
 async def create_task(
     task_data: dto_tasks.CreateTaskRequest,
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
 ):
-    task = handler.create_task(task_data, db, current_user)
-    return {"status": "successfully created task", "data": {"task": task}}
+    task = await handler.create_task(task_data, db, current_user)
+    return ORJSONResponse(
+        {"status": "successfully created task", "data": {"task": serialize_row(task)}},
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+# Bulk Create Tasks Endpoint
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    response_model=dto_misc.TaskBulkResponse[dto_tasks.BulkTaskResult],
+)
+async def create_tasks(
+    task_data: dto_tasks.BulkCreateTasksRequest,
+    db: AsyncSession = get_db_session,
+    current_user: int = validated_user,
+):
+    results = await handler.create_tasks(task_data, db, current_user)
+    return {"status": "success", "data": {"results": results}}
+
+
+# Bulk Update Tasks Endpoint
+@router.put(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    response_model=dto_misc.TaskBulkResponse[dto_tasks.BulkTaskResult],
+)
+async def update_tasks(
+    task_data: dto_tasks.BulkUpdateTasksRequest,
+    db: AsyncSession = get_db_session,
+    current_user: int = validated_user,
+):
+    results = await handler.update_tasks(task_data, db, current_user)
+    return {"status": "success", "data": {"results": results}}
+
+
+# Bulk Delete Tasks Endpoint
+@router.delete(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    response_model=dto_misc.TaskBulkResponse[dto_tasks.BulkTaskResult],
+)
+async def delete_tasks(
+    task_data: dto_tasks.BulkDeleteTasksRequest,
+    db: AsyncSession = get_db_session,
+    current_user: int = validated_user,
+):
+    results = await handler.delete_tasks(task_data, db, current_user)
+    return {"status": "success", "data": {"results": results}}
 
 
 # Update Task Endpoint
@@ -38,37 +104,75 @@ async def create_task(
 async def update_task(
     id: int,
     task_data: dto_tasks.UpdateTaskRequest,
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
 ):
-    task = handler.update_task(id, task_data, db, current_user)
-    return {"status": "successfully updated task", "data": {"task": task}}
+    task = await handler.update_task(id, task_data, db, current_user)
+    return ORJSONResponse(
+        {"status": "successfully updated task", "data": {"task": serialize_row(task)}}
+    )
 
 
 # Delete Task Endpoint
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_task(
     id: int,
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
 ):
-    return handler.delete_task(id, db, current_user)
+    return await handler.delete_task(id, db, current_user)
 
 
 # Get Tasks Endpoint
 @router.get(
     "/",
     status_code=status.HTTP_200_OK,
-    response_model=dto_misc.TaskMultipleResponse[dto_tasks.TaskResponse],
+    response_model=dto_misc.TaskPageResponse[dto_tasks.TaskPartialResponse],
+    response_model_exclude_unset=True,
 )
 async def get_tasks(
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
     search: Optional[str] = "",
     sort: Optional[str] = "due_date",
+    limit: int = page_limit,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include_archived: bool = False,
 ):
-    tasks = handler.get_tasks(db, current_user, search, sort)
-    return {"status": "success", "data": {"tasks": tasks}}
+    key = await cache.task_cache_key(
+        current_user.id,
+        "list",
+        search,
+        sort,
+        limit,
+        cursor,
+        fields,
+        include_archived,
+    )
+    cached = key and await cache.get(key)
+    if cached:
+        metrics.TASK_CACHE.labels("list", "hit").inc()
+        return Response(cached, media_type="application/json")
+    metrics.TASK_CACHE.labels("list", "miss").inc()
+    # Fill the cache from the primary; a lagging replica could store rows
+    # older than the version they are cached under
+    page = await handler.get_tasks(
+        db,
+        current_user,
+        search,
+        sort,
+        limit,
+        cursor,
+        fields,
+        include_archived,
+        replica=key is None,
+    )
+    page["tasks"] = serialize_rows(page["tasks"])
+    response = ORJSONResponse({"status": "success", "data": page})
+    if key:
+        await cache.set(key, response.body)
+    return response
 
 
 @router.get(
@@ -77,43 +181,135 @@ async def get_tasks(
     response_model=dto_misc.TaskMultipleResponse[dto_tasks.SimilarTaskResponse],
 )
 async def get_similar_tasks(
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
 ):
-    tasks = handler.get_similar_tasks(db, current_user)
+    tasks = await handler.get_similar_tasks(db, current_user)
     return {"status": "success", "data": {"tasks": tasks}}
 
 
+# Get Changes Since Cursor Endpoint
+@router.get(
+    "/changes",
+    status_code=status.HTTP_200_OK,
+    response_model=dto_misc.TaskChangesResponse[dto_tasks.TaskChangeResponse],
+)
+async def get_changes(
+    db: AsyncSession = get_db_session,
+    current_user: int = validated_user,
+    since: int = change_cursor,
+    limit: int = page_limit,
+):
+    changes = await handler.get_changes(db, current_user, since, limit)
+    changes["tasks"] = serialize_rows(changes["tasks"])
+    return ORJSONResponse({"status": "success", "data": changes})
+
+
+# Stream Task Events Endpoint
+@router.get("/events", status_code=status.HTTP_200_OK)
+async def stream_events(request: Request, current_user: int = validated_user):
+    return await handler.stream_events(request, current_user)
+
+
+# Export Tasks Endpoint
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_tasks(
+    db: AsyncSession = get_db_session,
+    current_user: int = validated_user,
+    format: str = export_format,
+    include_archived: bool = False,
+):
+    return await handler.export_tasks(db, current_user, format, include_archived)
+
+
+# Import Tasks Endpoint
+@router.post(
+    "/import",
+    status_code=status.HTTP_200_OK,
+    response_model=dto_misc.TaskImportResponse[dto_tasks.TaskImportResult],
+)
+async def import_tasks(
+    file: UploadFile = file,
+    db: AsyncSession = get_db_session,
+    current_user: int = validated_user,
+):
+    result = await handler.import_tasks(file, db, current_user)
+    return {"status": "success", "data": result}
+
+
 # Get Task Endpoint
 @router.get(
     "/{id}",
     status_code=status.HTTP_200_OK,
-    response_model=dto_misc.TaskSingleResponse[dto_tasks.TaskResponse],
+    response_model=dto_misc.TaskSingleResponse[dto_tasks.TaskPartialResponse],
+    response_model_exclude_unset=True,
 )
 async def get_task(
     id: int,
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
+    fields: Optional[str] = None,
 ):
-    task = handler.get_task(id, db, current_user)
-    return {"status": "success", "data": {"task": task}}
-
-
-file = File(...)
+    key = await cache.task_cache_key(current_user.id, "task", id, fields)
+    cached = key and await cache.get(key)
+    if cached:
+        metrics.TASK_CACHE.labels("task", "hit").inc()
+        return Response(cached, media_type="application/json")
+    metrics.TASK_CACHE.labels("task", "miss").inc()
+    task = await handler.get_task(id, db, current_user, fields)
+    response = ORJSONResponse(
+        {"status": "success", "data": {"task": serialize_row(task)}}
+    )
+    if key:
+        await cache.set(key, response.body)
+    return response
 
 
 # Upload File to Task Endpoint
 @router.post(
     "/{task_id}/file",
     status_code=status.HTTP_201_CREATED,
+    # The body is parsed by the handler as it streams in, so the form is
+    # described here rather than declared as an UploadFile parameter
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    },
 )
 async def upload_file(
     task_id: int,
-    file: UploadFile = file,
-    db: Session = get_db_session,
+    request: Request,
+    db: AsyncSession = get_db_session,
+    current_user: int = validated_user,
+):
+    return await handler.upload_file(task_id, request, db, current_user)
+
+
+# List Task Files Endpoint
+@router.get(
+    "/{task_id}/files",
+    status_code=status.HTTP_200_OK,
+    response_model=dto_misc.TaskFilesResponse[dto_tasks.AttachmentResponse],
+)
+async def get_files(
+    task_id: int,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
 ):
-    return await handler.upload_file(task_id, file, db, current_user)
+    files = await handler.get_files(task_id, db, current_user)
+    return ORJSONResponse(
+        {"status": "success", "data": {"files": serialize_rows(files)}}
+    )
 
 
 # Download File from Task Endpoint
@@ -122,9 +318,10 @@ async def upload_file(
     status_code=status.HTTP_202_ACCEPTED,
 )
 async def download_file(
+    request: Request,
     task_id: int,
     file_id: int,
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
 ):
-    return await handler.download_file(task_id, file_id, db, current_user)
+    return await handler.download_file(request, task_id, file_id, db, current_user)
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import get_db
 from src.dtos import dto_misc, dto_users
 from src.handler import users as handler
 from src.handler.utils import validate_user
+from src.idempotency import IdempotentRoute
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=IdempotentRoute)
 
 get_db_session = Depends(get_db)
 validated_user = Depends(validate_user)
@@ -19,7 +20,7 @@ validated_user = Depends(validate_user)
     response_model=dto_misc.UserSingleResponse[dto_users.UserResponse],
 )
 async def create_user(
-    user_data: dto_users.CreateUserRequest, db: Session = get_db_session
+    user_data: dto_users.CreateUserRequest, db: AsyncSession = get_db_session
 ):
     user = await handler.create_user(user_data, db)
     return {"status": "registration complete", "data": {"user": user}}
@@ -34,7 +35,7 @@ async def create_user(
 async def update_user(
     id: int,
     user_data: dto_users.UpdateUserRequest,
-    db: Session = get_db_session,
+    db: AsyncSession = get_db_session,
     current_user: int = validated_user,
 ):
     user = await handler.update_user(id, user_data, db, current_user)
@@ -43,17 +44,17 @@ async def update_user(
 
 # User Email Verification Endpoint
 @router.get("/verify-email", status_code=status.HTTP_202_ACCEPTED)
-def verify_email(token: int, db: Session = get_db_session):
-    return handler.verify_email(token, db)
+async def verify_email(token: int, db: AsyncSession = get_db_session):
+    return await handler.verify_email(token, db)
 
 
 # User Password Reset Request Endpoint
 @router.get("/{id}/reset-password-request", status_code=status.HTTP_201_CREATED)
-async def reset_password_request(id: int, db: Session = get_db_session):
+async def reset_password_request(id: int, db: AsyncSession = get_db_session):
     return await handler.reset_password_request(id, db)
 
 
 # User Password Reset Endpoint
 @router.get("/{id}/reset-password", status_code=status.HTTP_202_ACCEPTED)
-def reset_password(id: int, token: int, db: Session = get_db_session):
-    return handler.reset_password(id, token, db)
+async def reset_password(id: int, token: int, db: AsyncSession = get_db_session):
+    return await handler.reset_password(id, token, db)
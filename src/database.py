@@ -1,22 +1,191 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import DeclarativeBase, Session
 
 from .config import settings
 
-SQLALCHEMY_DATABASE_URL = f"postgresql+psycopg2://{settings.db_username}:{settings.db_password}@{settings.db_hostname}:{settings.db_port}/{settings.db_name}"
+logger = logging.getLogger(__name__)
+
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END;"
+)
+
+
+def database_url(driver: str = "asyncpg", database_name: Optional[str] = None):
+    database_name = database_name or settings.db_name
+    return f"postgresql+{driver}://{settings.db_username}:{settings.db_password}@{settings.db_hostname}:{settings.db_port}/{database_name}"
+
+
+def create_db_engine(
+    url: Optional[str] = None,
+    poolclass: Optional[type] = None,
+    connect_timeout: Optional[float] = None,
+) -> AsyncEngine:
+    url = url or database_url()
+    connect_args = {
+        "server_settings": {
+            "application_name": settings.db_application_name,
+            "statement_timeout": str(settings.db_statement_timeout),
+        }
+    }
+    if connect_timeout is not None:
+        connect_args["timeout"] = connect_timeout
+    if poolclass is not None:
+        return create_async_engine(url, poolclass=poolclass, connect_args=connect_args)
+    return create_async_engine(
+        url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args,
+    )
+
+
+engine = create_db_engine()
+
+# An unreachable replica fails fast instead of holding the request for the
+# driver's default connect timeout
+replica_engine = (
+    create_db_engine(
+        settings.db_replica_url,
+        connect_timeout=settings.db_replica_connect_timeout,
+    )
+    if settings.db_replica_url
+    else None
+)
+
+replica_state = {"healthy": False, "checked_at": None}
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, replica: bool = False, **kw):
+        if replica and replica_engine is not None and not self.info.get("has_writes"):
+            return replica_engine.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def track_writes(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info["has_writes"] = True
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
 
 class Base(DeclarativeBase):
     pass
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def replica_available() -> bool:
+    if replica_engine is None:
+        return False
+    now = time.monotonic()
+    checked_at = replica_state["checked_at"]
+    if checked_at is None or now - checked_at >= settings.db_replica_check_interval:
+        replica_state["checked_at"] = now
+        try:
+            async with replica_engine.connect() as connection:
+                lag = (await connection.execute(REPLICA_LAG_QUERY)).scalar()
+            replica_state["healthy"] = lag <= settings.db_replica_max_lag
+            if not replica_state["healthy"]:
+                logger.warning(f"Replica lagging by {lag} seconds")
+        except (OperationalError, InterfaceError, OSError) as e:
+            logger.warning(f"Replica unavailable: {e}")
+            mark_replica_unhealthy()
+    return replica_state["healthy"]
+
+
+def mark_replica_unhealthy():
+    # Not probed again until the check interval has passed
+    replica_state["healthy"] = False
+    replica_state["checked_at"] = time.monotonic()
+
+
+SET_LOCAL = text("SELECT set_config(:name, :value, true)")
+
+
+async def execute_read(
+    db: AsyncSession,
+    statement,
+    params=None,
+    replica=True,
+    local_settings: Optional[dict] = None,
+):
+    # Read-only queries go to the replica unless this session already wrote
+    # to the primary, so that reads after writes see their own changes.
+    # local_settings are applied for the transaction on whichever connection
+    # ends up running the statement
+    async def execute(**bind_arguments):
+        for name, value in (local_settings or {}).items():
+            await db.execute(
+                SET_LOCAL,
+                {"name": name, "value": str(value)},
+                bind_arguments=bind_arguments,
+            )
+        return await db.execute(statement, params, bind_arguments=bind_arguments)
+
+    if (
+        replica
+        and not db.sync_session.info.get("has_writes")
+        and await replica_available()
+    ):
+        try:
+            return await execute(replica=True)
+        except (OperationalError, InterfaceError, OSError) as e:
+            logger.warning(f"Replica query failed, falling back to primary: {e}")
+            mark_replica_unhealthy()
+    return await execute()
+
+
+async def stream_read(db: AsyncSession, statement, replica=True):
+    # execute_read for results fetched through a server-side cursor; falls back
+    # only when the cursor cannot be opened, not once rows are flowing
+    if (
+        replica
+        and not db.sync_session.info.get("has_writes")
+        and await replica_available()
+    ):
+        try:
+            return await db.stream(statement, bind_arguments={"replica": True})
+        except (OperationalError, InterfaceError, OSError) as e:
+            logger.warning(f"Replica query failed, falling back to primary: {e}")
+            mark_replica_unhealthy()
+    return await db.stream(statement)
+
+
+def pool_statistics():
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.db_max_overflow,
+    }
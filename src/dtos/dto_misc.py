@@ -38,6 +38,31 @@ class TaskMultipleObjects(GenericModel, Generic[M]):
         orm_mode = True
 
 
+class TaskPageObjects(GenericModel, Generic[M]):
+    tasks: List[M]
+    next_cursor: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+
+class TaskBulkObjects(GenericModel, Generic[M]):
+    results: List[M]
+
+    class Config:
+        orm_mode = True
+
+
+class TaskChangesObjects(GenericModel, Generic[M]):
+    tasks: List[M]
+    deleted: List[int]
+    next_cursor: int
+    has_more: bool
+
+    class Config:
+        orm_mode = True
+
+
 class TaskSingleResponse(BaseGenericResponse, Generic[M]):
     data: TaskSingleObject[M]
 
@@ -52,6 +77,45 @@ class TaskMultipleResponse(BaseGenericResponse, Generic[M]):
         orm_mode = True
 
 
+class TaskPageResponse(BaseGenericResponse, Generic[M]):
+    data: TaskPageObjects[M]
+
+    class Config:
+        orm_mode = True
+
+
+class TaskBulkResponse(BaseGenericResponse, Generic[M]):
+    data: TaskBulkObjects[M]
+
+    class Config:
+        orm_mode = True
+
+
+class TaskChangesResponse(BaseGenericResponse, Generic[M]):
+    data: TaskChangesObjects[M]
+
+    class Config:
+        orm_mode = True
+
+
+class TaskFilesObjects(GenericModel, Generic[M]):
+    files: List[M]
+
+    class Config:
+        orm_mode = True
+
+
+class TaskFilesResponse(BaseGenericResponse, Generic[M]):
+    data: TaskFilesObjects[M]
+
+    class Config:
+        orm_mode = True
+
+
+class TaskImportResponse(BaseGenericResponse, Generic[M]):
+    data: M
+
+
 class ReportSingleObject(GenericModel, Generic[M]):
     report: M
 
@@ -1,7 +1,9 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist
+
+from src.config import settings
 
 
 class TaskBase(BaseModel):
@@ -24,6 +26,24 @@ class UpdateTaskRequest(TaskBase):
     is_completed: Optional[bool] = False
 
 
+class BulkUpdateTaskRequest(UpdateTaskRequest):
+    id: int
+
+
+class BulkCreateTasksRequest(BaseModel):
+    tasks: conlist(CreateTaskRequest, min_items=1, max_items=settings.tasks_bulk_limit)
+
+
+class BulkUpdateTasksRequest(BaseModel):
+    tasks: conlist(
+        BulkUpdateTaskRequest, min_items=1, max_items=settings.tasks_bulk_limit
+    )
+
+
+class BulkDeleteTasksRequest(BaseModel):
+    ids: conlist(int, min_items=1, max_items=settings.tasks_bulk_limit)
+
+
 class TaskResponse(TaskBase):
     id: int
     user_id: int
@@ -37,10 +57,62 @@ class TaskResponse(TaskBase):
         orm_mode = True
 
 
+class TaskChangeResponse(TaskResponse):
+    change_seq: int
+
+    class Config:
+        orm_mode = True
+
+
+class TaskPartialResponse(BaseModel):
+    id: Optional[int]
+    user_id: Optional[int]
+    title: Optional[str]
+    description: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    due_date: Optional[datetime]
+    completed_at: Optional[datetime]
+    is_completed: Optional[bool]
+    rank: Optional[float]
+    snippet: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+
 class SimilarTaskResponse(BaseModel):
     title: str
     description: Optional[str]
     count: int
+    task_ids: List[int]
+
+    class Config:
+        orm_mode = True
+
+
+class BulkTaskResult(BaseModel):
+    id: Optional[int]
+    status: str
+    task: Optional[TaskResponse]
 
     class Config:
         orm_mode = True
+
+
+class AttachmentResponse(BaseModel):
+    id: int
+    file_name: Optional[str]
+    size: int
+    content_type: Optional[str]
+    sha256: Optional[str]
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class TaskImportResult(BaseModel):
+    imported: int
+    skipped: int
+    invalid_rows: List[int]
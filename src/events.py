@@ -0,0 +1,48 @@
+import logging
+
+import orjson
+from fastapi import Request
+
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+from src.config import settings
+from src.redis import get_async_redis
+from src.serializers import serialize_rows
+
+logger = logging.getLogger(__name__)
+
+
+def task_channel(user_id: int) -> str:
+    return f"tasks:user:{user_id}"
+
+
+async def publish_task_event(user_id: int, event: str, tasks: list):
+    # Called after commit; a missed event only costs clients a refetch, so a
+    # Redis outage must not fail the write
+    message = orjson.dumps({"event": event, "tasks": serialize_rows(tasks)})
+    try:
+        await get_async_redis().publish(task_channel(user_id), message)
+    except RedisError as e:
+        logger.warning(f"Could not publish {event} event: {e}")
+
+
+async def stream_task_events(user_id: int, request: Request):
+    # Every subscriber needs a connection of its own for the life of the stream
+    client = AsyncRedis.from_url(settings.redis_url)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(task_channel(user_id))
+    try:
+        yield ": connected\n\n"
+        while not await request.is_disconnected():
+            message = await pubsub.get_message(
+                timeout=settings.events_heartbeat_interval
+            )
+            if message is None:
+                yield ": heartbeat\n\n"
+                continue
+            event = orjson.loads(message["data"])["event"]
+            yield f"event: {event}\ndata: {message['data'].decode()}\n\n"
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.close()
+        await client.close()
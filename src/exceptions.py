@@ -28,3 +28,31 @@ class MaxTasksReachedError(Exception):
 
 class NoCompleteTasksError(Exception):
     pass
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+class InvalidFieldError(Exception):
+    pass
+
+
+class ExpiredCursorError(Exception):
+    pass
+
+
+class InvalidSortError(Exception):
+    pass
+
+
+class BlobTooLargeError(Exception):
+    pass
+
+
+class InvalidRangeError(Exception):
+    pass
+
+
+class InvalidUploadError(Exception):
+    pass
@@ -0,0 +1,13 @@
+from src import profiler
+from src.database import pool_statistics
+
+
+def sql_profile():
+    return {
+        "routes": profiler.summary(),
+        "recent": list(profiler.profiles),
+    }
+
+
+def db_pool():
+    return pool_statistics()
@@ -1,6 +1,6 @@
 from fastapi import HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.dtos import dto_users
 from src.exceptions import (
@@ -17,17 +17,19 @@ from src.repository import users as repository
 
 async def login(
     user_credentials: OAuth2PasswordRequestForm,
-    db: Session,
+    db: AsyncSession,
 ):
     try:
-        user = repository.get_user(db, user_id=None, email=user_credentials.username)
+        user = await repository.get_user(
+            db, user_id=None, email=user_credentials.username
+        )
     except GetError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=f'{"invalid credentials"}'
         ) from None
     if not user.is_verified:
         try:
-            token = repository.create_verification_token(user.id, db)
+            token = await repository.create_verification_token(user.id, db)
         except CreateError:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -60,12 +62,14 @@ async def login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-def oauth_login(
+async def oauth_login(
     user_credentials: dict,
-    db: Session,
+    db: AsyncSession,
 ):
     try:
-        user = repository.get_user(db, user_id=None, email=user_credentials["email"])
+        user = await repository.get_user(
+            db, user_id=None, email=user_credentials["email"]
+        )
     except GetError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -87,7 +91,7 @@ async def login_google():
     return await utils.google_sso.get_login_redirect()
 
 
-async def callback_google(request: Request, db: Session):
+async def callback_google(request: Request, db: AsyncSession):
     user = await utils.google_sso.verify_and_process(request)
     user_data = {
         "email": user.email,
@@ -97,15 +101,15 @@ async def callback_google(request: Request, db: Session):
     }
     oauth_user = dto_users.CreateUserRequest(**user_data)
     try:
-        oauth_check = repository.get_user(db, user_id=None, email=user.email)
+        oauth_check = await repository.get_user(db, user_id=None, email=user.email)
     except GetError:
         pass
-    if checks.is_email_same(oauth_user, db) and oauth_check.is_oauth is True:
+    if await checks.is_email_same(oauth_user, db) and oauth_check.is_oauth is True:
         data: dict = {"email": oauth_user.email, "password": oauth_user.password}
-        access_token = oauth_login(data, db)
+        access_token = await oauth_login(data, db)
         return access_token
     try:
-        new_oauth_user = repository.create_user(oauth_user, db)
+        new_oauth_user = await repository.create_user(oauth_user, db)
     except DuplicateEmailError:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -118,7 +122,7 @@ async def callback_google(request: Request, db: Session):
         ) from None
     user_data = dto_users.UpdateUserRestricted(is_verified=True, is_oauth=True)
     try:
-        repository.update_user_restricted(new_oauth_user.id, user_data, db)
+        await repository.update_user_restricted(new_oauth_user.id, user_data, db)
     except UpdateError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
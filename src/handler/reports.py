@@ -1,13 +1,13 @@
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.exceptions import NoCompleteTasksError
 from src.repository import reports as repository
 
 
-def count_tasks(db: Session, current_user: int):
+async def count_tasks(db: AsyncSession, current_user: int):
     try:
-        count = repository.get_count_of_tasks(current_user.id, db)
+        count = await repository.get_count_of_tasks(current_user.id, db)
         return count
     except Exception:
         raise HTTPException(
@@ -16,9 +16,9 @@ def count_tasks(db: Session, current_user: int):
         ) from None
 
 
-def average_tasks(db: Session, current_user: int):
+async def average_tasks(db: AsyncSession, current_user: int):
     try:
-        average = repository.get_average_tasks(current_user.id, db)
+        average = await repository.get_average_tasks(current_user.id, db)
         return average
     except Exception:
         raise HTTPException(
@@ -27,9 +27,9 @@ def average_tasks(db: Session, current_user: int):
         ) from None
 
 
-def overdue_tasks(db: Session, current_user: int):
+async def overdue_tasks(db: AsyncSession, current_user: int):
     try:
-        overdue = repository.get_overdue_tasks(current_user.id, db)
+        overdue = await repository.get_overdue_tasks(current_user.id, db)
         return overdue
     except Exception:
         raise HTTPException(
@@ -38,9 +38,9 @@ def overdue_tasks(db: Session, current_user: int):
         ) from None
 
 
-def date_max_tasks(db: Session, current_user: int):
+async def date_max_tasks(db: AsyncSession, current_user: int):
     try:
-        max_date = repository.get_date_of_max_tasks_completed(current_user.id, db)
+        max_date = await repository.get_date_of_max_tasks_completed(current_user.id, db)
         return max_date
     except NoCompleteTasksError:
         raise HTTPException(
@@ -53,9 +53,9 @@ def date_max_tasks(db: Session, current_user: int):
         ) from None
 
 
-def day_of_week_tasks(db: Session, current_user: int):
+async def day_of_week_tasks(db: AsyncSession, current_user: int):
     try:
-        tasks_per_day = repository.get_days_of_week_with_tasks_created(
+        tasks_per_day = await repository.get_days_of_week_with_tasks_created(
             current_user.id, db
         )
         return tasks_per_day
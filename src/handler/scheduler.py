@@ -1,29 +1,28 @@
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta, timezone
 
 from fastapi import APIRouter
-from fastapi_utils.session import FastAPISessionMaker
 from fastapi_utils.tasks import repeat_every
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config import settings
+from src.database import SessionLocal
 from src.handler import utils
 from src.repository import tasks as tasks_repository
 from src.repository import users as users_repository
 
-database_uri = f"postgresql+psycopg2://{settings.db_username}:{settings.db_password}@{settings.db_hostname}:{settings.db_port}/{settings.db_name}"
-sessionmaker = FastAPISessionMaker(database_uri)
-
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-async def send_tasks_reminder_mail(db: Session):
-    all_tasks_due_today = tasks_repository.all_tasks_due_today(db)
+async def send_tasks_reminder_mail(db: AsyncSession):
+    all_tasks_due_today = await tasks_repository.all_tasks_due_today(db)
     if not all_tasks_due_today:
         return
     user_ids_due_today = list({task.user_id for task in all_tasks_due_today})
     for user_id in user_ids_due_today:
-        user_tasks_due_today = tasks_repository.tasks_due_today(db, user_id)
+        user_tasks_due_today = await tasks_repository.tasks_due_today(db, user_id)
         user_tasks_list = []
         for task in user_tasks_due_today:
             task_dict = {
@@ -32,7 +31,7 @@ async def send_tasks_reminder_mail(db: Session):
                 "due_date": task.due_date.strftime("%Y-%m-%d %H:%M:%S"),
             }
             user_tasks_list.append(task_dict)
-        user = users_repository.get_user(db, user_id=user_id, email=None)
+        user = await users_repository.get_user(db, user_id=user_id, email=None)
         email = user.email
         template = "The following tasks are due today:\n"
         for task in user_tasks_list:
@@ -47,7 +46,7 @@ async def send_tasks_reminder_mail(db: Session):
 @router.on_event("startup")
 @repeat_every(seconds=60 * 5, wait_first=True)
 async def reminder_task():
-    with sessionmaker.context_session() as db:
+    async with SessionLocal() as db:
         now_utc = datetime.utcnow()
         target_time = datetime.utcnow().replace(
             hour=0, minute=0, second=0, microsecond=0
@@ -57,8 +56,84 @@ async def reminder_task():
         )
         if now_utc.date() == target_time.date():
             if now_utc >= target_time and target_time_max >= now_utc:
-                print("Sending Tasks Reminder Mail")
+                logger.info("Sending Tasks Reminder Mail")
                 try:
                     await send_tasks_reminder_mail(db)
-                except Exception as e:
-                    print(e)
+                except Exception:
+                    logger.exception("Sending Tasks Reminder Mail failed")
+
+
+async def archive_completed_tasks(db: AsyncSession):
+    before = datetime.now(timezone.utc) - timedelta(days=settings.archive_after_days)
+    archived = 0
+    while True:
+        batch = await tasks_repository.archive_completed_tasks(
+            db, before, settings.archive_batch_size
+        )
+        archived += len(batch)
+        if len(batch) < settings.archive_batch_size:
+            return archived
+
+
+@router.on_event("startup")
+@repeat_every(seconds=settings.archive_interval, wait_first=True)
+async def archive_task():
+    async with SessionLocal() as db:
+        try:
+            archived = await archive_completed_tasks(db)
+        except Exception:
+            logger.exception("Archiving completed tasks failed")
+        else:
+            if archived:
+                logger.info(f"Archived {archived} completed tasks")
+
+
+async def prune_tombstones(db: AsyncSession):
+    before = datetime.now(timezone.utc) - timedelta(
+        days=settings.tombstone_retention_days
+    )
+    pruned = 0
+    while True:
+        batch = await tasks_repository.prune_tombstones(
+            db, before, settings.tombstone_batch_size
+        )
+        pruned += len(batch)
+        if len(batch) < settings.tombstone_batch_size:
+            return pruned
+
+
+@router.on_event("startup")
+@repeat_every(seconds=settings.tombstone_prune_interval, wait_first=True)
+async def tombstone_prune_task():
+    async with SessionLocal() as db:
+        try:
+            pruned = await prune_tombstones(db)
+        except Exception:
+            logger.exception("Pruning task tombstones failed")
+        else:
+            if pruned:
+                logger.info(f"Pruned {pruned} task tombstones")
+
+
+async def collect_unreferenced_blobs(db: AsyncSession):
+    collected = 0
+    while True:
+        batch = await tasks_repository.collect_unreferenced_blobs(
+            db, settings.blob_gc_batch_size
+        )
+        collected += len(batch)
+        if len(batch) < settings.blob_gc_batch_size:
+            return collected
+
+
+@router.on_event("startup")
+@repeat_every(seconds=settings.blob_gc_interval, wait_first=True)
+async def blob_gc_task():
+    async with SessionLocal() as db:
+        try:
+            collected = await collect_unreferenced_blobs(db)
+        except Exception:
+            logger.exception("Collecting unreferenced blobs failed")
+        else:
+            if collected:
+                logger.info(f"Collected {collected} unreferenced blobs")
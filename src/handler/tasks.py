@@ -1,31 +1,54 @@
+import base64
+import csv
+import hashlib
+import heapq
+import io
+import json
 from datetime import datetime
+from itertools import islice
+from operator import itemgetter
 from typing import Optional
+from urllib.parse import quote
 from zoneinfo import ZoneInfo
 
-from fastapi import HTTPException, Response, UploadFile, status
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+import orjson
+from fastapi import HTTPException, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src import cache, events, storage
+from src.config import settings
 from src.dtos import dto_tasks
 from src.exceptions import (
+    BlobTooLargeError,
     CreateError,
     DeleteError,
+    ExpiredCursorError,
     GetError,
+    InvalidCursorError,
+    InvalidFieldError,
+    InvalidRangeError,
+    InvalidSortError,
+    InvalidUploadError,
     MaxTasksReachedError,
     UpdateError,
 )
-from src.models.tasks import Task
+from src.models.tasks import TASK_COLUMNS, Task
 from src.repository import tasks as repository
+from src.serializers import serialize_rows
 
 
-def create_task(
+async def create_task(
     task_data: dto_tasks.CreateTaskRequest,
-    db: Session,
+    db: AsyncSession,
     current_user: int,
 ):
     try:
         task = Task(user_id=current_user.id, **task_data.dict())
-        new_task = repository.create_task(current_user.id, task, db)
+        new_task = await repository.create_task(current_user.id, task, db)
         return new_task
     except MaxTasksReachedError:
         raise HTTPException(
@@ -39,10 +62,10 @@ def create_task(
         ) from None
 
 
-def update_task(
+async def update_task(
     id: int,
     task_data: dto_tasks.UpdateTaskRequest,
-    db: Session,
+    db: AsyncSession,
     current_user: int,
 ):
     local_tz = ZoneInfo("Asia/Karachi")
@@ -53,7 +76,7 @@ def update_task(
         task_data.completed_at = None
     try:
         task = Task(**task_data.dict())
-        updated_task = repository.update_task(id, task, db, current_user.id)
+        updated_task = await repository.update_task(id, task, db, current_user.id)
         return updated_task
     except UpdateError:
         raise HTTPException(
@@ -67,13 +90,13 @@ def update_task(
         ) from None
 
 
-def delete_task(
+async def delete_task(
     id: int,
-    db: Session,
+    db: AsyncSession,
     current_user: int,
 ):
     try:
-        repository.delete_task(id, db, current_user.id)
+        await repository.delete_task(id, db, current_user.id)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     except DeleteError:
         raise HTTPException(
@@ -87,15 +110,169 @@ def delete_task(
         ) from None
 
 
-def get_tasks(
-    db: Session,
+async def create_tasks(
+    task_data: dto_tasks.BulkCreateTasksRequest,
+    db: AsyncSession,
+    current_user: int,
+):
+    try:
+        new_tasks = await repository.create_tasks(current_user.id, task_data.tasks, db)
+    except CreateError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'{"message: something went wrong while creating the tasks"}',
+        ) from None
+    results = [{"id": task.id, "status": "created", "task": task} for task in new_tasks]
+    results += [
+        {"status": "maximum number of tasks reached"}
+        for _ in task_data.tasks[len(new_tasks) :]
+    ]
+    return results
+
+
+async def update_tasks(
+    task_data: dto_tasks.BulkUpdateTasksRequest,
+    db: AsyncSession,
+    current_user: int,
+):
+    local_tz = ZoneInfo("Asia/Karachi")
+    now_local = datetime.now(local_tz)
+    for task in task_data.tasks:
+        if task.is_completed is True:
+            task.completed_at = now_local
+        if task.is_completed is False:
+            task.completed_at = None
+    # the last change to an id wins, as it would with one request per task
+    changes = {task.id: task for task in task_data.tasks}
+    try:
+        updated_tasks = await repository.update_tasks(
+            current_user.id, list(changes.values()), db
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'{"something went wrong while updating the tasks"}',
+        ) from None
+    updated = {task.id: task for task in updated_tasks}
+    return [
+        {"id": task.id, "status": "updated", "task": updated[task.id]}
+        if task.id in updated
+        else {"id": task.id, "status": "not found"}
+        for task in task_data.tasks
+    ]
+
+
+async def delete_tasks(
+    task_data: dto_tasks.BulkDeleteTasksRequest,
+    db: AsyncSession,
+    current_user: int,
+):
+    try:
+        deleted_tasks = await repository.delete_tasks(
+            current_user.id, task_data.ids, db
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'{"something went wrong while deleting the tasks"}',
+        ) from None
+    deleted = {task.id for task in deleted_tasks}
+    return [
+        {"id": id, "status": "deleted" if id in deleted else "not found"}
+        for id in task_data.ids
+    ]
+
+
+def encode_cursor(sort: str, task) -> str:
+    value = task.rank if sort == "relevance" else getattr(task, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(
+        json.dumps([sort, value, task.id]).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        cursor_sort, value, id = json.loads(base64.urlsafe_b64decode(cursor))
+        if cursor_sort != sort:
+            raise InvalidCursorError
+        if value is not None and sort != "relevance":
+            if isinstance(repository.TASK_FIELDS[sort].type, DateTime):
+                value = datetime.fromisoformat(value)
+        return value, int(id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError from e
+
+
+def check_sort(sort: str, search: Optional[str]):
+    if sort == "relevance" and not search:
+        return "due_date"
+    if sort != "relevance" and sort not in repository.TASK_SORTS:
+        raise InvalidSortError(sort)
+    return sort
+
+
+def parse_fields(fields: Optional[str]):
+    if not fields:
+        return None
+    keys = [key.strip() for key in fields.split(",") if key.strip()]
+    unknown = sorted(set(keys) - set(repository.TASK_FIELDS))
+    if unknown:
+        raise InvalidFieldError(", ".join(unknown))
+    return keys
+
+
+async def get_tasks(
+    db: AsyncSession,
     current_user: int,
     search: Optional[str] = "",
     sort: Optional[str] = "due_date",
+    limit: int = settings.tasks_page_size,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include_archived: bool = False,
+    replica: bool = True,
 ):
     try:
-        tasks = repository.get_tasks(current_user.id, db, search, sort)
-        return tasks
+        sort = check_sort(sort, search)
+        keys = parse_fields(fields)
+        after = decode_cursor(cursor, sort) if cursor else None
+        tasks = await repository.get_tasks(
+            current_user.id,
+            db,
+            search,
+            sort,
+            after,
+            limit + 1,
+            keys,
+            include_archived,
+            replica,
+        )
+        next_cursor = (
+            encode_cursor(sort, tasks[limit - 1]) if len(tasks) > limit else None
+        )
+        tasks = tasks[:limit]
+        if keys:
+            # the sort column is selected for the cursor even when not asked for
+            keys = {"id", "rank", "snippet", *keys}
+            tasks = [
+                {key: value for key, value in task._mapping.items() if key in keys}
+                for task in tasks
+            ]
+        return {"tasks": tasks, "next_cursor": next_cursor}
+    except InvalidFieldError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"unknown fields: {e}"
+        ) from None
+    except InvalidSortError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"unknown sort: {e}"
+        ) from None
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f'{"invalid cursor"}'
+        ) from None
     except GetError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f'{"there are no tasks"}'
@@ -107,12 +284,12 @@ def get_tasks(
         ) from None
 
 
-def get_similar_tasks(
-    db: Session,
+async def get_similar_tasks(
+    db: AsyncSession,
     current_user: int,
 ):
     try:
-        tasks = repository.get_similar_tasks(current_user.id, db)
+        tasks = await repository.get_similar_tasks(current_user.id, db)
         return tasks
     except GetError:
         raise HTTPException(
@@ -126,14 +303,165 @@ def get_similar_tasks(
         ) from None
 
 
-def get_task(
+async def get_changes(
+    db: AsyncSession,
+    current_user: int,
+    since: int = 0,
+    limit: int = settings.tasks_page_size,
+):
+    try:
+        tasks, tombstones, horizon = await repository.get_changes(
+            current_user.id, since, limit + 1, db
+        )
+        # Starting over from 0 is always possible; any other cursor needs
+        # every tombstone after it to still be there
+        if since and since < horizon:
+            raise ExpiredCursorError
+    except ExpiredCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"cursor {since} is older than the retained deletions, sync again from 0",
+        ) from None
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'{"something went wrong while retrieving the changes"}',
+        ) from None
+    changes = list(
+        heapq.merge(
+            ((task.change_seq, False, task) for task in tasks),
+            ((tombstone.change_seq, True, tombstone) for tombstone in tombstones),
+            key=itemgetter(0),
+        )
+    )
+    page = changes[:limit]
+    return {
+        "tasks": [row for _, deleted, row in page if not deleted],
+        "deleted": [row.task_id for _, deleted, row in page if deleted],
+        "next_cursor": page[-1][0] if page else since,
+        "has_more": len(changes) > limit,
+    }
+
+
+async def stream_events(request: Request, current_user: int):
+    return StreamingResponse(
+        events.stream_task_events(current_user.id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def encode_export(partitions, format: str):
+    if format == "ndjson":
+        async for partition in partitions:
+            yield b"".join(
+                orjson.dumps(task) + b"\n" for task in serialize_rows(partition)
+            )
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in TASK_COLUMNS])
+    async for partition in partitions:
+        writer.writerows(partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def export_tasks(
+    db: AsyncSession,
+    current_user: int,
+    format: str = "ndjson",
+    include_archived: bool = False,
+):
+    partitions = repository.stream_tasks(current_user.id, db, include_archived)
+    return StreamingResponse(
+        encode_export(partitions, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+    )
+
+
+def read_import(file: UploadFile):
+    # Reads the spooled upload a line at a time rather than loading it whole.
+    # Lines are split on b"\n" before decoding, which can never fall inside a
+    # UTF-8 sequence, and keep their endings for the csv reader
+    lines = (line.decode("utf-8") for line in file.file)
+    if file.filename.endswith(".csv") or file.content_type == "text/csv":
+        for record in csv.DictReader(lines):
+            yield {key: value for key, value in record.items() if value != ""}
+        return
+    for line in lines:
+        if line.strip():
+            yield orjson.loads(line)
+
+
+async def import_tasks(file: UploadFile, db: AsyncSession, current_user: int):
+    imported, skipped, invalid = 0, 0, []
+    batch = []
+
+    async def flush():
+        nonlocal imported, skipped
+        created = await repository.create_tasks(current_user.id, batch, db)
+        imported += len(created)
+        skipped += len(batch) - len(created)
+        batch.clear()
+
+    records = enumerate(read_import(file), start=1)
+    try:
+        # The file reads and parsing are blocking, so each batch of records is
+        # pulled in the threadpool and only the inserts run on the event loop
+        while chunk := await run_in_threadpool(
+            list, islice(records, settings.tasks_import_batch_size)
+        ):
+            for row, record in chunk:
+                if skipped:
+                    # quota ran out, the rest is only counted
+                    skipped += 1
+                    continue
+                try:
+                    batch.append(dto_tasks.CreateTaskRequest.parse_obj(record))
+                except ValidationError:
+                    invalid.append(row)
+                if len(batch) >= settings.tasks_import_batch_size:
+                    await flush()
+        if batch:
+            await flush()
+    except (UnicodeDecodeError, orjson.JSONDecodeError, csv.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"could not parse the file after {imported} imported tasks",
+        ) from None
+    except CreateError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"something went wrong after {imported} imported tasks",
+        ) from None
+    return {"imported": imported, "skipped": skipped, "invalid_rows": invalid}
+
+
+async def get_task(
     id: int,
-    db: Session,
+    db: AsyncSession,
     current_user: int,
+    fields: Optional[str] = None,
 ):
     try:
-        task = repository.get_task(id, db, current_user.id)
+        task = await repository.get_task(id, db, current_user.id, parse_fields(fields))
         return task
+    except InvalidFieldError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"unknown fields: {e}"
+        ) from None
+    except InvalidSortError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"unknown sort: {e}"
+        ) from None
     except GetError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -148,12 +476,23 @@ def get_task(
 
 async def upload_file(
     task_id: int,
-    file: UploadFile,
-    db: Session,
+    request: Request,
+    db: AsyncSession,
     current_user: int,
 ):
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"file is larger than {settings.max_attachment_size} bytes",
+    )
+    # A declared length that cannot fit the limit is refused before any of
+    # the body is read; chunked bodies are still capped while streaming below
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > (
+        settings.max_attachment_size + storage.MULTIPART_OVERHEAD
+    ):
+        raise too_large
     try:
-        repository.get_task(task_id, db, current_user.id)
+        await repository.get_task(task_id, db, current_user.id, ["id"])
     except GetError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -164,9 +503,40 @@ async def upload_file(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f'{"something went wrong while retrieving the task"}',
         ) from None
-    file_name = file.filename
-    file_data = await file.read()
-    attachment = repository.create_file(task_id, file_name, file_data, db)
+    invalid_upload = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="expected a multipart/form-data body with a file field",
+    )
+    try:
+        upload = storage.UploadStream(request)
+        await upload.start()
+    except InvalidUploadError:
+        raise invalid_upload from None
+    file_name = upload.filename
+    store = storage.get_blob_store()
+    key = storage.new_blob_key("uploads")
+    digest = hashlib.sha256()
+    chunks = storage.limit_size(upload.chunks(), settings.max_attachment_size)
+    try:
+        size = await store.write(
+            key, storage.hash_chunks(chunks, digest), upload.content_type
+        )
+    except BlobTooLargeError:
+        raise too_large from None
+    except InvalidUploadError:
+        raise invalid_upload from None
+    try:
+        attachment = await repository.create_file(
+            task_id, file_name, digest.hexdigest(), size, upload.content_type, key, db
+        )
+    except Exception:
+        await db.rollback()
+        await store.delete(key)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'{"something went wrong while attaching the file"}',
+        ) from None
+    await cache.bump_user_version(current_user.id)
     return {
         "message": "successfully attached file",
         "file_name": f"{file_name}",
@@ -174,21 +544,39 @@ async def upload_file(
     }
 
 
+async def get_files(task_id: int, db: AsyncSession, current_user: int):
+    try:
+        await repository.get_task(task_id, db, current_user.id, ["id"])
+    except GetError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"not authorized to perform action or task with id: {task_id} does not exist",
+        ) from None
+    try:
+        return await repository.get_files(task_id, db)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'{"something went wrong while retrieving the files"}',
+        ) from None
+
+
 async def download_file(
+    request: Request,
     task_id: int,
     file_id: int,
-    db: Session,
+    db: AsyncSession,
     current_user: int,
 ):
     try:
-        repository.get_task(task_id, db, current_user.id)
+        await repository.get_task(task_id, db, current_user.id, ["id"])
     except GetError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"not authorized to perform action or task with id: {task_id} does not exist",
         ) from None
     try:
-        file = repository.get_file(file_id, task_id, db)
+        file = await repository.get_file(file_id, task_id, db)
     except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -199,10 +587,96 @@ async def download_file(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f'{"something went wrong while retrieving the file"}',
         ) from None
-    file_name = file.file_name
-    file_data = file.file_attachment
-    with open("temp_file", "wb") as f:
-        f.write(file_data)
-    return FileResponse(
-        path="temp_file", filename=file_name, media_type="application/octet-stream"
+    etag = attachment_etag(file)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    headers = {
+        "Content-Disposition": content_disposition(file.file_name),
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+    start, end = 0, file.size - 1
+    status_code = status.HTTP_200_OK
+    range_header = request.headers.get("range")
+    # A stale If-Range means the client's partial copy is of another version
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(range_header, file.size)
+        except InvalidRangeError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{file.size}"},
+            )
+        if byte_range:
+            start, end = byte_range
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["Content-Range"] = f"bytes {start}-{end}/{file.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    if not file.storage_key:
+        content = iter(
+            [
+                await repository.get_inline_file_content(
+                    file.id, start, end - start + 1, db
+                )
+            ]
+        )
+    elif status_code == status.HTTP_206_PARTIAL_CONTENT:
+        content = storage.get_blob_store().read(
+            file.storage_key, start, end - start + 1
+        )
+    else:
+        content = storage.get_blob_store().read(file.storage_key)
+    return StreamingResponse(
+        content,
+        status_code=status_code,
+        media_type=file.content_type or "application/octet-stream",
+        headers=headers,
     )
+
+
+def attachment_etag(file):
+    # Blobs are never rewritten under the same key, so the key identifies the
+    # content
+    if file.storage_key:
+        return f'"{file.storage_key.rsplit("/", 1)[-1]}"'
+    return f'"{file.id}-{file.size}"'
+
+
+def etag_matches(header: Optional[str], etag: str):
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def parse_range(header: str, size: int):
+    # Only single byte ranges are honoured; anything else gets the whole file
+    unit, _, spec = header.partition("=")
+    first, dash, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or "," in spec or not dash:
+        return None
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise InvalidRangeError
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise InvalidRangeError
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def content_disposition(file_name: Optional[str]):
+    file_name = file_name or "attachment"
+    quoted = quote(file_name)
+    if quoted != file_name:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{file_name}"'
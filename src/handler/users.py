@@ -7,7 +7,7 @@
 import secrets
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.dtos import dto_users
 from src.exceptions import (
@@ -24,11 +24,11 @@ from src.repository import checks
 from src.repository import users as repository
 
 
-async def create_user(user_data: dto_users.CreateUserRequest, db: Session):
+async def create_user(user_data: dto_users.CreateUserRequest, db: AsyncSession):
     try:
         user_data.password = utils.hash_password(user_data.password)
         user = User(**user_data.dict())
-        new_user = repository.create_user(user, db)
+        new_user = await repository.create_user(user, db)
     except DuplicateEmailError:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -40,7 +40,7 @@ async def create_user(user_data: dto_users.CreateUserRequest, db: Session):
             detail=f'{"message: something went wrong while creating a user"}',
         ) from None
     try:
-        token = repository.create_verification_token(new_user.id, db)
+        token = await repository.create_verification_token(new_user.id, db)
     except CreateError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -59,7 +59,7 @@ async def create_user(user_data: dto_users.CreateUserRequest, db: Session):
 async def update_user(
     id: int,
     user_data: dto_users.UpdateUserRequest,
-    db: Session,
+    db: AsyncSession,
     current_user: int,
 ):
     if id != current_user.id:
@@ -68,13 +68,13 @@ async def update_user(
             detail="not authorized to perform action",
         )
     if user_data.email:
-        if checks.is_email_same(user_data, db):
+        if await checks.is_email_same(user_data, db):
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail=f'{"this email is already used"}',
             )
         try:
-            token = repository.create_verification_token(id, db)
+            token = await repository.create_verification_token(id, db)
         except CreateError:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -89,7 +89,7 @@ async def update_user(
             ) from None
         user_restricted = User(is_verified=False)
         try:
-            repository.update_user_restricted(id, user_restricted, db)
+            await repository.update_user_restricted(id, user_restricted, db)
         except UpdateError:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -99,7 +99,7 @@ async def update_user(
         user_data.password = utils.hash_password(user_data.password)
     try:
         user = User(**user_data.dict())
-        updated_user = repository.update_user(id, user, db)
+        updated_user = await repository.update_user(id, user, db)
     except UpdateError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -108,14 +108,14 @@ async def update_user(
     return updated_user
 
 
-def verify_email(token: int, db: Session):
-    if checks.false_token(token, db):
+async def verify_email(token: int, db: AsyncSession):
+    if await checks.false_token(token, db):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="invalid or expired verification token",
         )
     try:
-        token_data = repository.delete_verification_token(token, db)
+        token_data = await repository.delete_verification_token(token, db)
     except DeleteError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -123,7 +123,7 @@ def verify_email(token: int, db: Session):
         ) from None
     user_data = dto_users.UpdateUserRestricted(is_verified=True)
     try:
-        repository.update_user_restricted(token_data.user_id, user_data, db)
+        await repository.update_user_restricted(token_data.user_id, user_data, db)
     except UpdateError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -132,9 +132,9 @@ def verify_email(token: int, db: Session):
     return {"message": "email verified"}
 
 
-async def reset_password_request(id: int, db: Session):
+async def reset_password_request(id: int, db: AsyncSession):
     try:
-        user = repository.get_user(db, user_id=id, email=None)
+        user = await repository.get_user(db, user_id=id, email=None)
     except GetError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -142,7 +142,7 @@ async def reset_password_request(id: int, db: Session):
         ) from None
     if user.is_verified is False:
         try:
-            token = repository.create_verification_token(user.id, db)
+            token = await repository.create_verification_token(user.id, db)
         except CreateError:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -165,7 +165,7 @@ async def reset_password_request(id: int, db: Session):
             detail=f'{"change your google account password instead"}',
         )
     try:
-        token = repository.create_verification_token(user.id, db)
+        token = await repository.create_verification_token(user.id, db)
     except CreateError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -181,14 +181,14 @@ async def reset_password_request(id: int, db: Session):
     return {"message": "check your email to proceed further"}
 
 
-def reset_password(id: int, token: int, db: Session):
-    if checks.false_token(token, db):
+async def reset_password(id: int, token: int, db: AsyncSession):
+    if await checks.false_token(token, db):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="invalid or expired verification token",
         )
     try:
-        repository.delete_verification_token(token, db)
+        await repository.delete_verification_token(token, db)
     except DeleteError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -202,7 +202,7 @@ def reset_password(id: int, token: int, db: Session):
     )
     user_data = dto_users.UpdateUserRequest(password=utils.hash_password(password))
     try:
-        repository.update_user(id, user_data, db)
+        await repository.update_user(id, user_data, db)
     except UpdateError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,3 +1,4 @@
+import logging
 from datetime import datetime, timedelta
 
 from aiosmtplib import SMTPDataError
@@ -8,9 +9,13 @@ from fastapi_sso.sso.google import GoogleSSO
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from src import metrics
 from src.config import settings
 from src.dtos import dto_misc, dto_users
 from src.exceptions import CreateError, SendEmailError
+from src.logger import log_context
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 oauth2 = Depends(oauth2_scheme)
@@ -36,7 +41,7 @@ def create_access_token(data: dict):
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     except JWTError as e:
-        print(f"Exception: {e}")
+        logger.error(f"Exception: {e}")
         raise CreateError from e
 
 
@@ -60,6 +65,21 @@ def validate_user(token: str = oauth2):
         headers={"WWW-Authenticate": "Bearer"},
     )
     user = verify_access_token(token, credentials_exception)
+    context = log_context.get()
+    if context is not None:
+        context["user_id"] = user.id
+    return user
+
+
+validated_user = Depends(validate_user)
+
+
+def validate_admin(user: dto_misc.TokenData = validated_user):
+    if user.email not in settings.admin_emails:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f'{"not authorized to perform action"}',
+        )
     return user
 
 
@@ -91,7 +111,8 @@ async def send_mail(email: dto_misc.EmailList, subject_template: str, template:
         subject=subject_template, recipients=[email], body=template, subtype="html"
     )
     fm = FastMail(conf)
-    await fm.send_message(message)
+    with metrics.SMTP_SEND_LATENCY.time():
+        await fm.send_message(message)
 
 
 async def send_verification_mail(user: dto_users.UserResponse, token: int):
@@ -103,7 +124,7 @@ async def send_verification_mail(user: dto_users.UserResponse, token: int):
             template=f"Click the following link to verify your email: {verification_url}",
         )
     except SMTPDataError as e:
-        print(f"Exception: {e}")
+        logger.error(f"Exception: {e}")
         raise SendEmailError from e
 
 
@@ -116,5 +137,5 @@ async def send_reset_password_mail(user: dto_users.UserResponse, token: int):
             template=f"Click the following link to reset your password: {reset_password_url}",
         )
     except SMTPDataError as e:
-        print(f"Exception: {e}")
+        logger.error(f"Exception: {e}")
         raise SendEmailError from e
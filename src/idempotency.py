@@ -0,0 +1,116 @@
+import asyncio
+import base64
+import hashlib
+import logging
+
+import orjson
+from fastapi import Request, Response, status
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+
+from redis.exceptions import RedisError
+from src.config import settings
+from src.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+
+
+def idempotency_key(request: Request, key: str) -> str:
+    # Keys are scoped to the caller's credentials and the endpoint, so one
+    # client can never replay another's response
+    scope = hashlib.sha256(request.headers.get("authorization", "").encode())
+    return f"idempotency:{scope.hexdigest()}:{request.url.path}:{key}"
+
+
+async def fingerprint(request: Request) -> str:
+    # Every body is hashed as sent, whatever its content type, so reusing a key
+    # for a different form or upload is caught as well
+    return hashlib.sha256(await request.body()).hexdigest()
+
+
+def replay(record: dict) -> Response:
+    headers = {**record["headers"], "Idempotent-Replayed": "true"}
+    body = base64.b64decode(record["body"])
+    return Response(body, record["status_code"], headers)
+
+
+async def run_once(request: Request, key: str, call_next) -> Response:
+    client = get_async_redis()
+    redis_key = idempotency_key(request, key)
+    request_fingerprint = await fingerprint(request)
+    in_flight = orjson.dumps({"state": "in_flight", "fingerprint": request_fingerprint})
+    deadline = asyncio.get_running_loop().time() + settings.idempotency_lock_ttl
+    while True:
+        if await client.set(
+            redis_key, in_flight, nx=True, ex=settings.idempotency_lock_ttl
+        ):
+            break
+        cached = await client.get(redis_key)
+        record = orjson.loads(cached) if cached else None
+        if record and record["fingerprint"] != request_fingerprint:
+            return ORJSONResponse(
+                {"detail": f"{HEADER} was already used for a different request"},
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record and record["state"] == "done":
+            return replay(record)
+        if asyncio.get_running_loop().time() > deadline:
+            return ORJSONResponse(
+                {"detail": f"a request with this {HEADER} is still in progress"},
+                status_code=status.HTTP_409_CONFLICT,
+            )
+        # Another worker holds the key; wait for it to store its response or
+        # to give the key up after a failure
+        await asyncio.sleep(settings.idempotency_poll_interval)
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        await release(client, redis_key)
+        raise
+    if response.status_code >= 500 or not hasattr(response, "body"):
+        await release(client, redis_key)
+        return response
+    record = {
+        "state": "done",
+        "fingerprint": request_fingerprint,
+        "status_code": response.status_code,
+        "headers": {
+            name: value
+            for name, value in response.headers.items()
+            if name != "content-length"
+        },
+        "body": base64.b64encode(response.body).decode(),
+    }
+    try:
+        await client.set(redis_key, orjson.dumps(record), ex=settings.idempotency_ttl)
+    except RedisError as e:
+        logger.warning(f"Could not store idempotent response: {e}")
+    return response
+
+
+async def release(client, redis_key: str):
+    # Lets a retry run again after a failure instead of waiting out the lock
+    try:
+        await client.delete(redis_key)
+    except RedisError as e:
+        logger.warning(f"Could not release idempotency key: {e}")
+
+
+class IdempotentRoute(APIRoute):
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def idempotent_route_handler(request: Request) -> Response:
+            key = request.headers.get(HEADER)
+            if request.method != "POST" or not key:
+                return await route_handler(request)
+            try:
+                return await run_once(request, key, route_handler)
+            except RedisError as e:
+                logger.warning(f"Idempotency store unavailable: {e}")
+                return await route_handler(request)
+
+        return idempotent_route_handler
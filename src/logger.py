@@ -1,15 +1,61 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from src.config import settings
+
+log_context: ContextVar[Optional[dict]] = ContextVar("log_context", default=None)
+
+CONTEXT_FIELDS = ("request_id", "route", "user_id", "status_code", "latency_ms")
+
+listener: Optional[QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the request context is captured on the calling thread,
+        # formatting happens on the listener thread
+        context = log_context.get()
+        if context:
+            for field, value in context.items():
+                if getattr(record, field, None) is None:
+                    setattr(record, field, value)
+        return record
 
 
 def setup_logger():
-    logger = logging.getLogger("src.main")
-    logger.setLevel(logging.DEBUG)
-    file_handler = RotatingFileHandler("app.log", maxBytes=10000000, backupCount=5)
-    file_handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    return logger
+    global listener
+    if listener is None:
+        file_handler = RotatingFileHandler("app.log", maxBytes=10000000, backupCount=5)
+        file_handler.setFormatter(JSONFormatter())
+        log_queue = queue.SimpleQueue()
+        logger = logging.getLogger("src")
+        logger.setLevel(settings.log_level)
+        logger.addHandler(ContextQueueHandler(log_queue))
+        for name, level in settings.log_levels.items():
+            logging.getLogger(name).setLevel(level)
+        listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+    return logging.getLogger("src.main")
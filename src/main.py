@@ -1,19 +1,26 @@
 import os
+import random
+import time
+import uuid
 
-import sqltap
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-from src.logger import setup_logger
+from src import metrics, profiler
+from src.config import settings
+from src.logger import log_context, setup_logger
 
-from .controller import auth, reports, tasks, users
+from .controller import admin, auth
+from .controller import metrics as metrics_controller
+from .controller import reports, tasks, users
 from .handler import scheduler
 
 logger = setup_logger()
 
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,44 +31,140 @@ app.add_middleware(
 )
 
 
-async def set_body(request: Request, body: bytes):
-    async def receive():
-        return {"type": "http.request", "body": body}
+TEXT_CONTENT_TYPES = ("application/json", "application/x-www-form-urlencoded", "text/")
 
-    request._receive = receive
 
+def is_loggable(headers) -> bool:
+    if "content-disposition" in headers:
+        return False
+    return headers.get("content-type", "").startswith(TEXT_CONTENT_TYPES)
 
-async def get_body(request: Request) -> bytes:
-    body = await request.body()
-    await set_body(request, body)
-    return body
+
+def format_body(body: bytearray, total_bytes: int) -> str:
+    if total_bytes and total_bytes > len(body):
+        return f"{bytes(body)} ... ({total_bytes - len(body)} more bytes)"
+    return f"{bytes(body)}"
+
+
+def capture_request_body(request: Request, body: bytearray):
+    receive = request._receive
+    max_bytes = settings.request_log_max_body_bytes
+
+    async def capturing_receive():
+        message = await receive()
+        if message["type"] == "http.request":
+            chunk = message.get("body", b"")
+            if len(body) < max_bytes:
+                body.extend(chunk[: max_bytes - len(body)])
+        return message
+
+    request._receive = capturing_receive
+
+
+def capture_response_body(response: Response):
+    body_iterator = response.body_iterator
+    max_bytes = settings.request_log_max_body_bytes
+    context = log_context.get()
+
+    async def capturing_iterator():
+        body = bytearray()
+        total_bytes = 0
+        try:
+            async for chunk in body_iterator:
+                total_bytes += len(chunk)
+                if len(body) < max_bytes:
+                    body.extend(chunk[: max_bytes - len(body)])
+                yield chunk
+        finally:
+            logger.info(
+                f"Response Body: {format_body(body, total_bytes)}", extra=context
+            )
+
+    response.body_iterator = capturing_iterator()
+
+
+def route_path(request: Request) -> str:
+    route = request.scope.get("route")
+    if route is None:
+        return request.url.path
+    return route.path
 
 
 @app.middleware("http")
 async def app_entry(request: Request, call_next):
+    start_time = time.perf_counter()
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    context = {"request_id": request_id, "route": request.url.path}
+    token = log_context.set(context)
+    try:
+        response = await log_request(request, call_next)
+    finally:
+        log_context.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    logger.info(
+        f"Request Completed: {request.method} {context['route']}",
+        extra={
+            **context,
+            "status_code": response.status_code,
+            "latency_ms": round((time.perf_counter() - start_time) * 1000, 2),
+        },
+    )
+    return response
+
+
+async def log_request(request: Request, call_next):
     logger.info(f"Incoming Request: {request.method} {request.url}")
-    await set_body(request, await request.body())
-    logger.info(f"Request Body: {await get_body(request)}")
+    sampled = random.random() < settings.request_log_sample_rate
+    log_request_body = sampled and is_loggable(request.headers)
+    request_body = bytearray()
+    if log_request_body:
+        capture_request_body(request, request_body)
     response = await call_next(request)
+    log_context.get()["route"] = route_path(request)
+    if log_request_body:
+        request_bytes = int(request.headers.get("content-length", 0))
+        logger.info(f"Request Body: {format_body(request_body, request_bytes)}")
     logger.info(f"Outgoing Response: {response.status_code}")
-    res_body = b""
-    async for chunk in response.body_iterator:
-        res_body += chunk
-    logger.info(f"Response Body: {res_body}")
-    return Response(
-        content=res_body,
-        status_code=response.status_code,
-        headers=dict(response.headers),
-        media_type=response.media_type,
-    )
+    # Binary and streaming responses are passed through without being captured
+    if (
+        sampled
+        and is_loggable(response.headers)
+        and "content-length" in response.headers
+    ):
+        capture_response_body(response)
+    return response
 
 
 @app.middleware("http")
-async def add_sql_tap(request: Request, call_next):
-    profiler = sqltap.start()
-    response = await call_next(request)
-    statistics = profiler.collect()
-    sqltap.report(statistics, "report.txt", report_format="text")
+async def record_metrics(request: Request, call_next):
+    start_time = time.perf_counter()
+    queries = [0]
+    token = metrics.request_queries.set(queries)
+    metrics.REQUESTS_IN_PROGRESS.inc()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        metrics.REQUESTS_IN_PROGRESS.dec()
+        metrics.request_queries.reset(token)
+        route = route_path(request) if "route" in request.scope else "unmatched"
+        metrics.REQUEST_LATENCY.labels(request.method, route, status_code).observe(
+            time.perf_counter() - start_time
+        )
+        metrics.REQUEST_QUERIES.labels(request.method, route).observe(queries[0])
+    return response
+
+
+@app.middleware("http")
+async def profile_sql(request: Request, call_next):
+    if not profiler.should_profile(request.headers):
+        return await call_next(request)
+    profile, token = profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.finish(profile, token, request.method, route_path(request))
     return response
 
 
@@ -70,6 +173,8 @@ app.include_router(tasks.router)
 app.include_router(auth.router)
 app.include_router(scheduler.router)
 app.include_router(reports.router)
+app.include_router(admin.router)
+app.include_router(metrics_controller.router)
 
 
 @app.get("/")
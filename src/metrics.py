@@ -0,0 +1,84 @@
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.database import engine
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status_code"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served"
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries executed per HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool"
+)
+DB_POOL_OVERFLOW_CHECKOUTS = Counter(
+    "db_pool_overflow_checkouts_total",
+    "Checkouts that found no idle pooled connection and opened an overflow one",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Overflow connections currently open beyond the pool size"
+)
+REPORT_CACHE = Counter(
+    "report_cache_requests_total",
+    "Report cache lookups by report type and result",
+    ["report", "result"],
+)
+TASK_CACHE = Counter(
+    "task_cache_requests_total",
+    "Task read cache lookups by read type and result",
+    ["read", "result"],
+)
+SMTP_SEND_LATENCY = Histogram(
+    "smtp_send_duration_seconds", "Time taken to send an email over SMTP"
+)
+
+DB_POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout())
+DB_POOL_OVERFLOW.set_function(lambda: max(engine.pool.overflow(), 0))
+
+request_queries: ContextVar[Optional[list]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKOUTS.inc()
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def connect(dbapi_connection, connection_record):
+    if engine.pool.overflow() > 0:
+        DB_POOL_OVERFLOW_CHECKOUTS.inc()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = request_queries.get()
+    if queries is not None:
+        queries[0] += 1
@@ -1,17 +1,34 @@
 from sqlalchemy import (
+    DDL,
     TIMESTAMP,
+    BigInteger,
     Boolean,
     Column,
+    Computed,
     ForeignKey,
+    Index,
     Integer,
     LargeBinary,
+    Sequence,
     String,
+    event,
     text,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from ..database import Base
 
+SEARCH_CONFIG = "english"
+
+SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A')"
+    f" || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+)
+
+# Stamps every task write and deletion so clients can sync from a cursor
+task_change_seq = Sequence("task_change_seq", metadata=Base.metadata)
+
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -34,19 +51,206 @@ class Task(Base):
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
     )
+    change_seq = Column(
+        BigInteger,
+        nullable=False,
+        server_default=task_change_seq.next_value(),
+        onupdate=task_change_seq.next_value(),
+    )
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(SEARCH_VECTOR, persisted=True),
+        )
+    )
+    # Normalized text compared by trigram similarity to find near-duplicates
+    similarity_key = deferred(
+        Column(
+            String,
+            Computed(
+                "btrim(regexp_replace(lower(title || ' ' || coalesce(description, '')),"
+                " '[^[:alnum:]]+', ' ', 'g'))",
+                persisted=True,
+            ),
+        )
+    )
 
     owner = relationship("User", back_populates="tasks")
     attachments = relationship("Attachment", back_populates="attachment")
 
+    __table_args__ = (
+        Index("ix_tasks_user_id_due_date", "user_id", "due_date", "id"),
+        Index("ix_tasks_user_id_created_at", "user_id", "created_at", "id"),
+        Index("ix_tasks_user_id_title", "user_id", "title", "id"),
+        Index(
+            "ix_tasks_user_id_completed_at",
+            "user_id",
+            "completed_at",
+            postgresql_where=text("is_completed"),
+        ),
+        Index(
+            "ix_tasks_due_date",
+            "due_date",
+            postgresql_where=text("due_date IS NOT NULL"),
+        ),
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_tasks_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_tasks_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+        Index("ix_tasks_user_id_change_seq", "user_id", "change_seq"),
+        Index(
+            "ix_tasks_user_id_similarity_key",
+            "user_id",
+            "similarity_key",
+            postgresql_using="gin",
+            postgresql_ops={"similarity_key": "gin_trgm_ops"},
+        ),
+    )
+
+
+event.listen(
+    Task.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
+event.listen(
+    Task.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gin")
+)
+
+# Every column except the derived search ones and the sync stamp, for reads
+# and RETURNING clauses
+TASK_COLUMNS = [
+    column
+    for column in Task.__table__.c
+    if column.key not in ("search_vector", "similarity_key", "change_seq")
+]
+
 
 class Attachment(Base):
     __tablename__ = "attachments"
 
     id = Column(Integer, primary_key=True, index=True)
     file_name = Column(String)
-    file_attachment = Column(LargeBinary)
+    # Only set on attachments stored before the blob store; newer files live
+    # under storage_key
+    file_attachment = deferred(Column(LargeBinary))
+    storage_key = Column(String)
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), index=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String)
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()")
+    )
     task_id = Column(
         Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False, index=True
     )
 
     attachment = relationship("Task", back_populates="attachments")
+
+
+# Attachment content stored once per SHA-256; ref_count is kept by a trigger on
+# attachments so cascaded deletes are counted too, and unreferenced blobs are
+# collected by the scheduler
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, server_default=text("0"))
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_blobs_unreferenced", "sha256", postgresql_where=text("ref_count = 0")
+        ),
+    )
+
+
+BLOB_REFS_FUNCTION = """
+CREATE OR REPLACE FUNCTION attachments_blob_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE blobs SET ref_count = ref_count + 1 WHERE sha256 = NEW.blob_sha256;
+    ELSE
+        UPDATE blobs SET ref_count = ref_count - 1 WHERE sha256 = OLD.blob_sha256;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+BLOB_REFS_TRIGGER = """
+CREATE TRIGGER attachments_blob_refs
+AFTER INSERT OR DELETE ON attachments
+FOR EACH ROW EXECUTE FUNCTION attachments_blob_refs()
+"""
+
+event.listen(Attachment.__table__, "after_create", DDL(BLOB_REFS_FUNCTION))
+event.listen(Attachment.__table__, "after_create", DDL(BLOB_REFS_TRIGGER))
+
+
+class TaskTombstone(Base):
+    __tablename__ = "task_tombstones"
+
+    task_id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    change_seq = Column(
+        BigInteger, nullable=False, server_default=task_change_seq.next_value()
+    )
+    deleted_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+
+    __table_args__ = (
+        Index("ix_task_tombstones_user_id_change_seq", "user_id", "change_seq"),
+        Index("ix_task_tombstones_deleted_at", "deleted_at"),
+    )
+
+
+# Newest change_seq among each user's pruned tombstones; a cursor older than
+# it may have missed deletions and has to sync again from the start
+class TaskTombstoneHorizon(Base):
+    __tablename__ = "task_tombstone_horizons"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    change_seq = Column(BigInteger, nullable=False)
+
+
+# Completed tasks moved out of the hot table by the archival job, partitioned
+# by month of completion; partitions are created by the job as it needs them
+class TaskArchive(Base):
+    __tablename__ = "tasks_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String, nullable=False)
+    description = Column(String)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    due_date = Column(TIMESTAMP(timezone=True))
+    completed_at = Column(TIMESTAMP(timezone=True), primary_key=True)
+    is_completed = Column(Boolean, nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    archived_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR, persisted=True)))
+
+    __table_args__ = (
+        Index("ix_tasks_archive_user_id_completed_at", "user_id", "completed_at"),
+        {"postgresql_partition_by": "RANGE (completed_at)"},
+    )
@@ -23,6 +23,7 @@ class User(Base):
     )
     is_verified = Column(Boolean, nullable=False, server_default=text("FALSE"))
     is_oauth = Column(Boolean, server_default=text("FALSE"))
+    task_count = Column(Integer, nullable=False, server_default=text("0"))
 
     tasks = relationship("Task", back_populates="owner")
     verifications = relationship("Verification", back_populates="tokens")
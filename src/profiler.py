@@ -0,0 +1,98 @@
+import heapq
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config import settings
+
+current_profile: ContextVar[Optional[dict]] = ContextVar(
+    "current_profile", default=None
+)
+profiles = deque(maxlen=settings.sql_profile_buffer_size)
+
+
+def should_profile(headers) -> bool:
+    if headers.get(settings.sql_profile_header, "").lower() in ("1", "true", "yes"):
+        return True
+    return random.random() < settings.sql_profile_sample_rate
+
+
+def start():
+    profile = {"query_count": 0, "total_time": 0.0, "slowest": []}
+    token = current_profile.set(profile)
+    return profile, token
+
+
+def finish(profile: dict, token, method: str, route: str):
+    current_profile.reset(token)
+    profiles.append(
+        {
+            "method": method,
+            "route": route,
+            "query_count": profile["query_count"],
+            "total_time": profile["total_time"],
+            "slowest": sorted(profile["slowest"], reverse=True),
+        }
+    )
+
+
+def summary():
+    routes = {}
+    for profile in list(profiles):
+        key = f"{profile['method']} {profile['route']}"
+        route = routes.setdefault(
+            key,
+            {
+                "route": key,
+                "requests": 0,
+                "query_count": 0,
+                "total_time": 0.0,
+                "slowest": [],
+            },
+        )
+        route["requests"] += 1
+        route["query_count"] += profile["query_count"]
+        route["total_time"] += profile["total_time"]
+        route["slowest"] = heapq.nlargest(
+            settings.sql_profile_slowest_statements,
+            route["slowest"] + profile["slowest"],
+        )
+    return [
+        {
+            "route": route["route"],
+            "requests": route["requests"],
+            "query_count": route["query_count"],
+            "average_query_count": route["query_count"] / route["requests"],
+            "total_time": route["total_time"],
+            "slowest": [
+                {"duration": duration, "statement": statement}
+                for duration, statement in route["slowest"]
+            ],
+        }
+        for route in routes.values()
+    ]
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        context._profile_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is None or not hasattr(context, "_profile_start_time"):
+        return
+    duration = time.perf_counter() - context._profile_start_time
+    profile["query_count"] += 1
+    profile["total_time"] += duration
+    if len(profile["slowest"]) < settings.sql_profile_slowest_statements:
+        heapq.heappush(profile["slowest"], (duration, statement))
+    else:
+        heapq.heappushpop(profile["slowest"], (duration, statement))
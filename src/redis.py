@@ -1,3 +1,19 @@
+import asyncio
+import weakref
+
+from redis.asyncio import Redis as AsyncRedis
 from redis.client import Redis
+from src.config import settings
+
+redis_client = Redis.from_url(settings.redis_url)
+
+async_redis_clients = weakref.WeakKeyDictionary()
+
 
-redis_client = Redis(host="redis", port=6379, db=0)
+def get_async_redis() -> AsyncRedis:
+    # redis.asyncio connections belong to the event loop that opened them
+    loop = asyncio.get_running_loop()
+    client = async_redis_clients.get(loop)
+    if client is None:
+        client = async_redis_clients[loop] = AsyncRedis.from_url(settings.redis_url)
+    return client
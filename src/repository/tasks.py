@@ -1,12 +1,37 @@
-from datetime import date
-from typing import Optional
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
 
-from sqlalchemy import Date, cast, func
+from sqlalchemy import (
+    TIMESTAMP,
+    Boolean,
+    Date,
+    Integer,
+    String,
+    and_,
+    any_,
+    cast,
+    column,
+    delete,
+    exists,
+    func,
+    literal,
+    or_,
+    select,
+    text,
+    tuple_,
+    union_all,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from sqlalchemy.sql.functions import coalesce
 
+from src import cache, events, storage
 from src.config import settings
+from src.database import execute_read, stream_read
 from src.exceptions import (
     CreateError,
     DeleteError,
@@ -14,17 +39,29 @@ from src.exceptions import (
     MaxTasksReachedError,
     UpdateError,
 )
-from src.models.tasks import Attachment, Task
-from src.repository import checks
+from src.models.tasks import (
+    SEARCH_CONFIG,
+    TASK_COLUMNS,
+    Attachment,
+    Blob,
+    Task,
+    TaskArchive,
+    TaskTombstone,
+    TaskTombstoneHorizon,
+)
+from src.repository import users
 
+logger = logging.getLogger(__name__)
 
-def create_task(id, task: Task, db: Session):
-    if checks.max_tasks_reached(db, id):
+
+async def create_task(id, task: Task, db: AsyncSession):
+    if not await users.reserve_tasks(db, id):
+        await db.rollback()
         raise MaxTasksReachedError
     try:
         query = (
             Task.__table__.insert()
-            .returning("*")
+            .returning(*TASK_COLUMNS)
             .values(
                 title=task.title,
                 description=task.description,
@@ -34,18 +71,21 @@ def create_task(id, task: Task, db: Session):
                 user_id=task.user_id,
             )
         )
-        new_task = db.execute(query).fetchone()
-        db.commit()
+        new_task = (await db.execute(query)).fetchone()
+        await db.commit()
+        await cache.bump_user_version(id)
+        await events.publish_task_event(id, "created", [new_task])
         return new_task
     except SQLAlchemyError as e:
-        print(f"Exception: {e}")
+        logger.error(f"Exception: {e}")
         raise CreateError from e
 
 
-def update_task(task_id: int, task: Task, db: Session, user_id: int):
+async def update_task(task_id: int, task: Task, db: AsyncSession, user_id: int):
+    await users.lock_user(db, user_id)
     query = (
         Task.__table__.update()
-        .returning("*")
+        .returning(*TASK_COLUMNS)
         .where(Task.__table__.c.id == task_id, Task.__table__.c.user_id == user_id)
         .values(
             title=coalesce(task.title, Task.__table__.c.title),
@@ -55,120 +95,625 @@ def update_task(task_id: int, task: Task, db: Session, user_id: int):
             completed_at=task.completed_at,
         )
     )
-    updated_task = db.execute(query).fetchone()
-    db.commit()
+    updated_task = (await db.execute(query)).fetchone()
+    await db.commit()
     if not updated_task:
         raise UpdateError
+    await cache.bump_user_version(user_id)
+    await events.publish_task_event(user_id, "updated", [updated_task])
     return updated_task
 
 
-def delete_task(task_id: int, db: Session, user_id: int):
+async def delete_task(task_id: int, db: AsyncSession, user_id: int):
+    await users.lock_user(db, user_id)
     query = (
         Task.__table__.delete()
-        .returning("*")
+        .returning(*TASK_COLUMNS)
         .where(Task.__table__.c.id == task_id, Task.__table__.c.user_id == user_id)
     )
-    deleted_task = db.execute(query).fetchone()
-    db.commit()
+    deleted_task = (await db.execute(query)).fetchone()
     if not deleted_task:
+        await db.rollback()
         raise DeleteError
+    await write_tombstones(user_id, [deleted_task.id], db)
+    await users.release_tasks(db, user_id)
+    await db.commit()
+    await cache.bump_user_version(user_id)
+    await events.publish_task_event(user_id, "deleted", [deleted_task])
     return deleted_task
 
 
-def get_task(task_id: int, db: Session, user_id):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+async def create_tasks(user_id: int, tasks: list, db: AsyncSession):
+    accepted = tasks[: await users.reserve_tasks(db, user_id, len(tasks))]
+    if not accepted:
+        await db.rollback()
+        return []
+    query = Task.__table__.insert().returning(
+        *TASK_COLUMNS, sort_by_parameter_order=True
+    )
+    try:
+        new_tasks = (
+            await db.execute(
+                query,
+                [
+                    {
+                        "title": task.title,
+                        "description": task.description,
+                        "due_date": task.due_date,
+                        "is_completed": task.is_completed,
+                        "completed_at": task.completed_at,
+                        "user_id": user_id,
+                    }
+                    for task in accepted
+                ],
+            )
+        ).all()
+        await db.commit()
+        await cache.bump_user_version(user_id)
+        await events.publish_task_event(user_id, "created", new_tasks)
+        return new_tasks
+    except SQLAlchemyError as e:
+        logger.error(f"Exception: {e}")
+        raise CreateError from e
+
+
+async def update_tasks(user_id: int, tasks: list, db: AsyncSession):
+    await users.lock_user(db, user_id)
+    changes = values(
+        column("id", Integer),
+        column("title", String),
+        column("description", String),
+        column("due_date", TIMESTAMP(timezone=True)),
+        column("is_completed", Boolean),
+        column("completed_at", TIMESTAMP(timezone=True)),
+        name="changes",
+    ).data(
+        [
+            (
+                task.id,
+                task.title,
+                task.description,
+                task.due_date,
+                task.is_completed,
+                task.completed_at,
+            )
+            for task in tasks
+        ]
+    )
+    # None renders as a bare NULL inside VALUES, so type the columns explicitly
+    change = {
+        key: cast(changes.c[key], changes.c[key].type) for key in changes.c.keys()
+    }
+    query = (
+        Task.__table__.update()
+        .returning(*TASK_COLUMNS)
+        .where(Task.id == change["id"], Task.user_id == user_id)
+        .values(
+            title=coalesce(change["title"], Task.title),
+            description=coalesce(change["description"], Task.description),
+            due_date=coalesce(change["due_date"], Task.due_date),
+            is_completed=coalesce(change["is_completed"], Task.is_completed),
+            completed_at=change["completed_at"],
+        )
+    )
+    updated_tasks = (await db.execute(query)).all()
+    await db.commit()
+    if updated_tasks:
+        await cache.bump_user_version(user_id)
+        await events.publish_task_event(user_id, "updated", updated_tasks)
+    return updated_tasks
+
+
+async def delete_tasks(user_id: int, ids: list, db: AsyncSession):
+    await users.lock_user(db, user_id)
+    query = (
+        Task.__table__.delete()
+        .returning(*TASK_COLUMNS)
+        .where(Task.id == any_(literal(ids, ARRAY(Integer))), Task.user_id == user_id)
+    )
+    deleted_tasks = (await db.execute(query)).all()
+    if deleted_tasks:
+        await write_tombstones(user_id, [task.id for task in deleted_tasks], db)
+        await users.release_tasks(db, user_id, len(deleted_tasks))
+    await db.commit()
+    if deleted_tasks:
+        await cache.bump_user_version(user_id)
+        await events.publish_task_event(user_id, "deleted", deleted_tasks)
+    return deleted_tasks
+
+
+async def write_tombstones(user_id: int, task_ids: list, db: AsyncSession):
+    query = TaskTombstone.__table__.insert().values(
+        [{"task_id": task_id, "user_id": user_id} for task_id in task_ids]
+    )
+    await db.execute(query)
+
+
+# Held for the duration of an archival batch so only one worker moves rows
+ARCHIVE_LOCK = 7_302_001
+
+
+async def create_archive_partitions(months: set, db: AsyncSession):
+    for month in sorted(months):
+        end = (month + timedelta(days=32)).replace(day=1)
+        await db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS tasks_archive_{month:%Y_%m}"
+                " PARTITION OF tasks_archive"
+                f" FOR VALUES FROM ('{month} 00:00+00') TO ('{end} 00:00+00')"
+            )
+        )
+
+
+async def archive_completed_tasks(db: AsyncSession, before: datetime, batch_size: int):
+    locked = (
+        await db.execute(select(func.pg_try_advisory_xact_lock(ARCHIVE_LOCK)))
+    ).scalar()
+    if not locked:
+        await db.rollback()
+        return []
+    # Tasks with attachments stay put, the files hang off the live row
+    archivable = and_(
+        Task.is_completed,
+        Task.completed_at < before,
+        ~exists().where(Attachment.task_id == Task.id),
+    )
+    batch = (
+        await db.execute(
+            select(Task.id, Task.user_id, Task.completed_at)
+            .where(archivable)
+            .order_by(Task.completed_at)
+            .limit(batch_size)
+        )
+    ).all()
+    if not batch:
+        await db.rollback()
+        return []
+    await users.lock_users(db, {task.user_id for task in batch})
+    await create_archive_partitions(
+        {
+            task.completed_at.astimezone(timezone.utc).date().replace(day=1)
+            for task in batch
+        },
+        db,
+    )
+    keys = [column.key for column in TASK_COLUMNS]
+    moved = (
+        Task.__table__.delete()
+        .where(Task.id == any_(literal([task.id for task in batch], ARRAY(Integer))))
+        .where(archivable)
+        .returning(*TASK_COLUMNS)
+        .cte("moved")
+    )
+    query = (
+        TaskArchive.__table__.insert()
+        .from_select(keys, select(*(moved.c[key] for key in keys)))
+        .returning(*(TaskArchive.__table__.c[key] for key in keys))
+    )
+    archived = (await db.execute(query)).all()
+    by_user = {}
+    for task in archived:
+        by_user.setdefault(task.user_id, []).append(task)
+    for user_id, user_tasks in by_user.items():
+        await write_tombstones(user_id, [task.id for task in user_tasks], db)
+        await users.release_tasks(db, user_id, len(user_tasks))
+    await db.commit()
+    for user_id, user_tasks in by_user.items():
+        await cache.bump_user_version(user_id)
+        await events.publish_task_event(user_id, "archived", user_tasks)
+    return archived
+
+
+async def get_changes(user_id: int, since: int, limit: int, db: AsyncSession):
+    tasks_query = (
+        select(*TASK_COLUMNS, Task.change_seq)
+        .where(Task.user_id == user_id, Task.change_seq > since)
+        .order_by(Task.change_seq)
+        .limit(limit)
+    )
+    tombstones_query = (
+        select(TaskTombstone.task_id, TaskTombstone.change_seq)
+        .where(TaskTombstone.user_id == user_id, TaskTombstone.change_seq > since)
+        .order_by(TaskTombstone.change_seq)
+        .limit(limit)
+    )
+    horizon_query = select(TaskTombstoneHorizon.change_seq).where(
+        TaskTombstoneHorizon.user_id == user_id
+    )
+    tasks = (await execute_read(db, tasks_query)).all()
+    tombstones = (await execute_read(db, tombstones_query)).all()
+    # Read after the tombstones, so a prune landing in between can only make
+    # the cursor look expired, never hide a deletion
+    horizon = (await execute_read(db, horizon_query)).scalar() or 0
+    return tasks, tombstones, horizon
+
+
+async def prune_tombstones(db: AsyncSession, before: datetime, batch_size: int):
+    batch = (
+        select(TaskTombstone.task_id)
+        .where(TaskTombstone.deleted_at < before)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    query = (
+        delete(TaskTombstone)
+        .where(TaskTombstone.task_id.in_(batch.scalar_subquery()))
+        .returning(TaskTombstone.user_id, TaskTombstone.change_seq)
+    )
+    pruned = (await db.execute(query)).all()
+    if not pruned:
+        await db.rollback()
+        return []
+    horizons = {}
+    for user_id, change_seq in pruned:
+        horizons[user_id] = max(change_seq, horizons.get(user_id, 0))
+    query = insert(TaskTombstoneHorizon).values(
+        [
+            {"user_id": user_id, "change_seq": change_seq}
+            for user_id, change_seq in horizons.items()
+        ]
+    )
+    query = query.on_conflict_do_update(
+        index_elements=[TaskTombstoneHorizon.user_id],
+        set_={
+            "change_seq": func.greatest(
+                TaskTombstoneHorizon.change_seq, query.excluded.change_seq
+            )
+        },
+    )
+    await db.execute(query)
+    await db.commit()
+    return pruned
+
+
+TASK_FIELDS = {column.key: column for column in TASK_COLUMNS}
+
+TASK_SORTS = ("due_date", "created_at", "updated_at", "completed_at", "title")
+
+
+def task_columns(fields: Optional[list] = None):
+    if not fields:
+        return TASK_COLUMNS
+    return [
+        column for key, column in TASK_FIELDS.items() if key == "id" or key in fields
+    ]
+
+
+async def get_task(
+    task_id: int, db: AsyncSession, user_id, fields: Optional[list] = None
+):
+    query = select(*task_columns(fields)).where(
+        Task.id == task_id, Task.user_id == user_id
+    )
+    task = (await db.execute(query)).first()
     if not task:
         raise GetError
     return task
 
 
-def get_tasks(
+def seek_after(query, column, cursor, limit: Optional[int] = None):
+    id_column = column.table.c.id
+    value, last_id = cursor
+    if value is None:
+        return (
+            query.where(column.is_(None), id_column > last_id)
+            .order_by(id_column)
+            .limit(limit)
+        )
+    after = (
+        query.where(tuple_(column, id_column) > tuple_(value, last_id))
+        .order_by(column, id_column)
+        .limit(limit)
+    )
+    if not column.nullable:
+        return after
+    # A row comparison never matches NULL, so the NULL tail is read as a second
+    # index range rather than OR-ed in, which would turn the seek into a scan
+    nulls = query.where(column.is_(None)).order_by(id_column).limit(limit)
+    page = union_all(after, nulls).subquery()
+    return select(page).order_by(page.c[column.key], page.c.id).limit(limit)
+
+
+def all_tasks():
+    # Live and archived tasks as one relation; filters on it are pushed down
+    # into both sides so each still reads its own indexes
+    keys = [*TASK_FIELDS, "search_vector"]
+    return union_all(
+        select(*(Task.__table__.c[key] for key in keys)),
+        select(*(TaskArchive.__table__.c[key] for key in keys)),
+    ).subquery("tasks")
+
+
+def get_tasks_query(
     user_id: int,
-    db: Session,
     search: Optional[str] = "",
     sort: Optional[str] = "due_date",
+    cursor: Optional[tuple] = None,
+    limit: Optional[int] = None,
+    fields: Optional[list] = None,
+    include_archived: bool = False,
 ):
-    sort_attr = getattr(Task, sort)
-    tasks = (
-        db.query(Task)
-        .filter(
-            Task.user_id == user_id,
-            Task.title.contains(search),
+    tasks = (all_tasks() if include_archived else Task.__table__).c
+    if sort == "relevance" and not search:
+        sort = "due_date"
+    columns = [tasks[column.key] for column in task_columns(fields)]
+    if sort != "relevance" and sort not in {column.key for column in columns}:
+        columns = [*columns, tasks[sort]]
+    query = select(*columns).where(tasks.user_id == user_id)
+    if search:
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, search)
+        rank = (
+            func.ts_rank_cd(tasks.search_vector, ts_query)
+            + func.greatest(
+                func.word_similarity(search, tasks.title),
+                func.word_similarity(search, func.coalesce(tasks.description, "")),
+            )
+        ).label("rank")
+        snippet = func.ts_headline(
+            SEARCH_CONFIG,
+            func.concat_ws(" ", tasks.title, tasks.description),
+            ts_query,
+            "StartSel=<b>, StopSel=</b>, MaxFragments=2",
+        ).label("snippet")
+        query = query.add_columns(rank, snippet).where(
+            or_(
+                tasks.search_vector.op("@@")(ts_query),
+                tasks.title.op("%>")(search),
+                tasks.description.op("%>")(search),
+                tasks.title.icontains(search, autoescape=True),
+                tasks.description.icontains(search, autoescape=True),
+            )
         )
-        .order_by(sort_attr)
-        .all()
+        if sort == "relevance":
+            if cursor:
+                value, last_id = cursor
+                query = query.where(
+                    or_(rank < value, and_(rank == value, tasks.id > last_id))
+                )
+            return query.order_by(rank.desc(), tasks.id).limit(limit)
+    if cursor:
+        return seek_after(query, tasks[sort], cursor, limit)
+    return query.order_by(tasks[sort], tasks.id).limit(limit)
+
+
+async def get_tasks(
+    user_id: int,
+    db: AsyncSession,
+    search: Optional[str] = "",
+    sort: Optional[str] = "due_date",
+    cursor: Optional[tuple] = None,
+    limit: Optional[int] = None,
+    fields: Optional[list] = None,
+    include_archived: bool = False,
+    replica: bool = True,
+):
+    query = get_tasks_query(
+        user_id, search, sort, cursor, limit, fields, include_archived
     )
-    if not tasks:
+    tasks = (await execute_read(db, query, replica=replica)).all()
+    if not tasks and cursor is None:
         raise GetError
     return tasks
 
 
-def get_max_tasks(id: int, db: Session):
-    max_tasks = (
-        db.query(Task.user_id)
-        .filter(Task.user_id == id)
-        .group_by(Task.user_id)
-        .having(func.count(Task.user_id) == settings.max_tasks)
-        .first()
+async def stream_tasks(user_id: int, db: AsyncSession, include_archived: bool = False):
+    tasks = (all_tasks() if include_archived else Task.__table__).c
+    query = (
+        select(*(tasks[column.key] for column in TASK_COLUMNS))
+        .where(tasks.user_id == user_id)
+        .execution_options(yield_per=settings.tasks_export_batch_size)
     )
-    return max_tasks
+    result = await stream_read(db, query)
+    async for partition in result.partitions():
+        yield partition
 
 
-def get_similar_tasks(user_id: int, db: Session):
-    similar_tasks = (
-        db.query(Task.title, Task.description, func.count("*").label("count"))
-        .filter(Task.user_id == user_id)
-        .group_by(Task.title, Task.description)
-        .having(func.count("*") > 1)
-    ).all()
-    if not similar_tasks:
+async def get_similar_tasks(user_id: int, db: AsyncSession):
+    # Pairs come from the (user_id, similarity_key) trigram index through `%`,
+    # whose cut-off is set to the configured threshold for this read
+    task = aliased(Task, name="task")
+    match = aliased(Task, name="match")
+    query = (
+        select(task.id, task.title, task.description, match.id.label("match_id"))
+        .join(
+            match,
+            and_(
+                match.user_id == task.user_id,
+                match.id > task.id,
+                match.similarity_key.op("%")(task.similarity_key),
+            ),
+        )
+        .where(
+            task.user_id == user_id,
+            func.similarity(task.similarity_key, match.similarity_key)
+            >= settings.similarity_threshold,
+        )
+        .order_by(task.id)
+    )
+    threshold = {"pg_trgm.similarity_threshold": settings.similarity_threshold}
+    pairs = (await execute_read(db, query, local_settings=threshold)).all()
+    if not pairs:
         raise GetError
-    return similar_tasks
+    parent = {}
+
+    def find(id):
+        while parent.setdefault(id, id) != id:
+            parent[id] = parent[parent[id]]
+            id = parent[id]
+        return id
 
+    for pair in pairs:
+        roots = find(pair.id), find(pair.match_id)
+        parent[max(roots)] = min(roots)
+    clusters = {}
+    for id in sorted(parent):
+        clusters.setdefault(find(id), []).append(id)
+    # Each cluster is rooted at its lowest id, which is always the left side of
+    # some pair
+    names = {pair.id: pair for pair in pairs}
+    return [
+        {
+            "title": names[root].title,
+            "description": names[root].description,
+            "count": len(ids),
+            "task_ids": ids,
+        }
+        for root, ids in clusters.items()
+    ]
 
-def all_tasks_due_today(db: Session):
-    all_tasks_due_today = (
-        db.query(Task).filter(cast(Task.due_date, Date) == date.today()).all()
+
+def tasks_due_today_query(user_id: Optional[int] = None):
+    # A range on the raw column instead of casting it to a date keeps the
+    # predicate usable by the due_date indexes
+    today = date.today()
+    query = select(Task).where(
+        Task.due_date >= literal(today, Date),
+        Task.due_date < literal(today + timedelta(days=1), Date),
     )
+    if user_id is not None:
+        query = query.where(Task.user_id == user_id)
+    return query
+
+
+async def all_tasks_due_today(db: AsyncSession):
+    query = tasks_due_today_query()
+    all_tasks_due_today = (await db.execute(query)).scalars().all()
     return all_tasks_due_today
 
 
-def tasks_due_today(db: Session, user_id: int):
-    user_tasks_due_today = (
-        db.query(Task)
-        .filter(
-            cast(Task.due_date, Date) == date.today(),
-            Task.user_id == user_id,
-        )
-        .all()
-    )
+async def tasks_due_today(db: AsyncSession, user_id: int):
+    query = tasks_due_today_query(user_id)
+    user_tasks_due_today = (await db.execute(query)).scalars().all()
     return user_tasks_due_today
 
 
-def create_file(task_id: int, file_name: str, file_data: bytes, db: Session):
-    attachment = Attachment(
-        task_id=task_id, file_attachment=file_data, file_name=file_name
-    )
+async def discard_content(sha256s: List[str], db: AsyncSession):
+    # Content may only be removed by whoever holds its blob row. The rows are
+    # claimed the same way an upload does, so this waits for any upload still
+    # in flight and leaves alone content that a committed row points at; the
+    # claim itself is rolled back once the content is gone
     query = (
-        Attachment.__table__.insert()
-        .returning("*")
-        .values(
-            task_id=attachment.task_id,
-            file_attachment=attachment.file_attachment,
-            file_name=attachment.file_name,
-        )
+        insert(Blob)
+        .values([{"sha256": sha256, "size": 0} for sha256 in sha256s])
+        .on_conflict_do_nothing()
+        .returning(Blob.sha256)
     )
-    new_file = db.execute(query).fetchone()
-    db.commit()
+    try:
+        claimed = (await db.execute(query)).scalars().all()
+        store = storage.get_blob_store()
+        for sha256 in claimed:
+            await store.delete(storage.content_key(sha256))
+    finally:
+        await db.rollback()
+
+
+async def create_file(
+    task_id: int,
+    file_name: str,
+    sha256: str,
+    size: int,
+    content_type: Optional[str],
+    upload_key: str,
+    db: AsyncSession,
+):
+    store = storage.get_blob_store()
+    moved = False
+    try:
+        # The blob row stays locked until commit, so the collector cannot
+        # remove its content between here and the attachment taking a reference
+        while True:
+            query = (
+                insert(Blob)
+                .values(sha256=sha256, size=size)
+                .on_conflict_do_nothing()
+                .returning(Blob.sha256)
+            )
+            if (await db.execute(query)).first():
+                await store.move(upload_key, storage.content_key(sha256))
+                moved = True
+                break
+            query = select(Blob.sha256).where(Blob.sha256 == sha256).with_for_update()
+            if (await db.execute(query)).first():
+                break
+        query = (
+            Attachment.__table__.insert()
+            .returning(Attachment.id, Attachment.file_name, Attachment.size)
+            .values(
+                task_id=task_id,
+                file_name=file_name,
+                storage_key=storage.content_key(sha256),
+                blob_sha256=sha256,
+                size=size,
+                content_type=content_type,
+            )
+        )
+        new_file = (await db.execute(query)).fetchone()
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        # The content was promoted for a row that never got committed
+        if moved:
+            await discard_content([sha256], db)
+        raise
+    if not moved:
+        await store.delete(upload_key)
     return new_file
 
 
-def get_file(file_id: int, task_id: int, db: Session):
-    file = (
-        db.query(Attachment)
-        .filter(Attachment.id == file_id, Attachment.task_id == task_id)
-        .first()
+ATTACHMENT_COLUMNS = [
+    Attachment.id,
+    Attachment.file_name,
+    Attachment.size,
+    Attachment.content_type,
+    Attachment.blob_sha256.label("sha256"),
+    Attachment.created_at,
+]
+
+
+async def get_files(task_id: int, db: AsyncSession):
+    query = (
+        select(*ATTACHMENT_COLUMNS)
+        .where(Attachment.task_id == task_id)
+        .order_by(Attachment.created_at, Attachment.id)
     )
+    return (await execute_read(db, query)).all()
+
+
+async def get_file(file_id: int, task_id: int, db: AsyncSession):
+    query = select(*ATTACHMENT_COLUMNS, Attachment.storage_key).where(
+        Attachment.id == file_id, Attachment.task_id == task_id
+    )
+    file = (await db.execute(query)).first()
     if not file:
         raise FileNotFoundError
     return file
+
+
+async def get_inline_file_content(
+    file_id: int, start: int, length: int, db: AsyncSession
+):
+    # Attachments from before the blob store keep their bytes in the row; only
+    # the requested slice is read out of it
+    query = select(func.substring(Attachment.file_attachment, start + 1, length)).where(
+        Attachment.id == file_id
+    )
+    return (await db.execute(query)).scalar() or b""
+
+
+async def collect_unreferenced_blobs(db: AsyncSession, batch_size: int):
+    query = (
+        select(Blob.sha256)
+        .where(Blob.ref_count == 0)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    unreferenced = (await db.execute(query)).scalars().all()
+    if not unreferenced:
+        await db.rollback()
+        return []
+    # The rows go first, so a failure past this point can only leave content
+    # without a row, never a row without its content
+    await db.execute(delete(Blob).where(Blob.sha256.in_(unreferenced)))
+    await db.commit()
+    await discard_content(unreferenced, db)
+    return unreferenced
@@ -1,11 +1,13 @@
+import logging
 from datetime import datetime, timedelta
 from random import randint
 from typing import Optional
 
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.functions import coalesce
 
+from src.config import settings
 from src.exceptions import (
     CreateError,
     DeleteError,
@@ -16,9 +18,11 @@ from src.exceptions import (
 from src.models.users import User, Verification
 from src.repository import checks
 
+logger = logging.getLogger(__name__)
 
-def create_user(user: User, db: Session):
-    if checks.is_email_same(user, db):
+
+async def create_user(user: User, db: AsyncSession):
+    if await checks.is_email_same(user, db):
         raise DuplicateEmailError
     try:
         query = (
@@ -31,15 +35,15 @@ def create_user(user: User, db: Session):
                 password=user.password,
             )
         )
-        new_user = db.execute(query).fetchone()
-        db.commit()
+        new_user = (await db.execute(query)).fetchone()
+        await db.commit()
         return new_user
     except Exception as e:
-        print(f"Exception: {e}")
+        logger.error(f"Exception: {e}")
         raise CreateError from e
 
 
-def update_user(user_id: int, user: User, db: Session):
+async def update_user(user_id: int, user: User, db: AsyncSession):
     query = (
         User.__table__.update()
         .returning("*")
@@ -51,14 +55,14 @@ def update_user(user_id: int, user: User, db: Session):
             password=coalesce(user.password, User.__table__.c.password),
         )
     )
-    user = db.execute(query).fetchone()
+    user = (await db.execute(query)).fetchone()
     if not user:
         raise UpdateError
-    db.commit()
+    await db.commit()
     return user
 
 
-def update_user_restricted(user_id: int, user: User, db: Session):
+async def update_user_restricted(user_id: int, user: User, db: AsyncSession):
     query = (
         User.__table__.update()
         .returning("*")
@@ -68,25 +72,26 @@ def update_user_restricted(user_id: int, user: User, db: Session):
             is_oauth=coalesce(user.is_oauth, User.__table__.c.is_oauth),
         )
     )
-    user = db.execute(query).fetchone()
+    user = (await db.execute(query)).fetchone()
     if not user:
         raise UpdateError
-    db.commit()
+    await db.commit()
     return user
 
 
-def get_user(db: Session, user_id: Optional[int], email: Optional[str]):
-    user = db.query(User).filter(or_(User.id == user_id, User.email == email)).first()
+async def get_user(db: AsyncSession, user_id: Optional[int], email: Optional[str]):
+    query = select(User).where(or_(User.id == user_id, User.email == email))
+    user = (await db.execute(query)).scalars().first()
     if not user:
         raise GetError
     return user
 
 
-def create_verification_token(id: int, db: Session):
+async def create_verification_token(id: int, db: AsyncSession):
     try:
-        token = get_verification_token(db, token=None, id=id)
+        token = await get_verification_token(db, token=None, id=id)
         if token:
-            delete_verification_token(token.token, db)
+            await delete_verification_token(token.token, db)
     except GetError:
         pass
     except DeleteError:
@@ -107,34 +112,83 @@ def create_verification_token(id: int, db: Session):
                 expires_at=verification_token.expires_at,
             )
         )
-        new_token = db.execute(query).fetchone()
-        db.commit()
+        new_token = (await db.execute(query)).fetchone()
+        await db.commit()
         return new_token
     except Exception as e:
-        print(f"Exception: {e}")
+        logger.error(f"Exception: {e}")
         raise CreateError from e
 
 
-def delete_verification_token(token: int, db: Session):
+async def delete_verification_token(token: int, db: AsyncSession):
     query = (
         Verification.__table__.delete()
         .returning("*")
         .where(Verification.__table__.c.token == token)
     )
-    deleted_token = db.execute(query).fetchone()
-    db.commit()
+    deleted_token = (await db.execute(query)).fetchone()
+    await db.commit()
     if not deleted_token:
         raise DeleteError
-    db.commit()
+    await db.commit()
     return deleted_token
 
 
-def get_verification_token(db: Session, token: Optional[int], id: Optional[int]):
-    verification_token = (
-        db.query(Verification)
-        .filter(or_(Verification.token == token, Verification.user_id == id))
-        .first()
+async def get_verification_token(
+    db: AsyncSession, token: Optional[int], id: Optional[int]
+):
+    query = select(Verification).where(
+        or_(Verification.token == token, Verification.user_id == id)
     )
+    verification_token = (await db.execute(query)).scalars().first()
     if not verification_token:
         raise GetError
     return verification_token
+
+
+async def lock_user(db: AsyncSession, user_id: int):
+    # Task writes hold the owner's row lock until commit, so change sequence
+    # numbers within one user are handed out in commit order
+    query = select(User.id).where(User.id == user_id).with_for_update()
+    await db.execute(query)
+
+
+async def lock_users(db: AsyncSession, user_ids: list):
+    # Same lock as lock_user for writes spanning users, taken in id order so
+    # two such writers cannot deadlock
+    query = (
+        select(User.id).where(User.id.in_(user_ids)).order_by(User.id).with_for_update()
+    )
+    await db.execute(query)
+
+
+async def reserve_tasks(db: AsyncSession, user_id: int, count: int = 1):
+    # Locks the user's row and takes as much of the quota as is left in one
+    # statement, so concurrent creates queue up instead of overshooting.
+    # updated_at is carried over so the counter does not count as a profile edit
+    current = (
+        select(User.id, User.task_count)
+        .where(User.id == user_id)
+        .with_for_update()
+        .cte("current")
+    )
+    granted = func.least(count, settings.max_tasks - current.c.task_count)
+    query = (
+        update(User)
+        .where(User.id == current.c.id, current.c.task_count < settings.max_tasks)
+        .values(task_count=User.task_count + granted, updated_at=User.updated_at)
+        .returning(granted)
+    )
+    return (await db.execute(query)).scalar() or 0
+
+
+async def release_tasks(db: AsyncSession, user_id: int, count: int = 1):
+    query = (
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            task_count=func.greatest(User.task_count - count, 0),
+            updated_at=User.updated_at,
+        )
+    )
+    await db.execute(query)
@@ -0,0 +1,13 @@
+def serialize_row(row):
+    if row is None or isinstance(row, dict):
+        return row
+    return dict(zip(row._fields, row, strict=True))
+
+
+def serialize_rows(rows) -> list:
+    # Rows are zipped with their column names directly instead of being
+    # validated attribute by attribute through the response model
+    if not rows or isinstance(rows[0], dict):
+        return list(rows)
+    fields = rows[0]._fields
+    return [dict(zip(fields, row, strict=True)) for row in rows]
@@ -0,0 +1,319 @@
+import os
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+
+import anyio
+from aiobotocore.session import get_session
+from fastapi import Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+from src.config import settings
+from src.exceptions import BlobTooLargeError, InvalidUploadError
+
+# Room left in a request's Content-Length for the multipart boundaries and
+# part headers around the file itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+def new_blob_key(prefix: str) -> str:
+    return f"{prefix}/{uuid.uuid4().hex}"
+
+
+def content_key(sha256: str) -> str:
+    return f"sha256/{sha256[:2]}/{sha256}"
+
+
+class UploadStream:
+    # Parses a multipart/form-data body as it arrives, so the file field goes
+    # to the blob store chunk by chunk instead of being spooled to a
+    # temporary file by Starlette first
+    def __init__(self, request: Request, field: str = "file"):
+        content_type, options = parse_options_header(
+            request.headers.get("content-type", "")
+        )
+        if content_type != b"multipart/form-data" or b"boundary" not in options:
+            raise InvalidUploadError
+        self.body = request.stream().__aiter__()
+        self.field = field.encode()
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.headers = {}
+        self.header_field = bytearray()
+        self.header_value = bytearray()
+        self.selected = False
+        self.pending = []
+        self.ended = False
+        self.exhausted = False
+        self.parser = MultipartParser(
+            options[b"boundary"],
+            {
+                "on_part_begin": self.on_part_begin,
+                "on_header_field": self.on_header_field,
+                "on_header_value": self.on_header_value,
+                "on_header_end": self.on_header_end,
+                "on_headers_finished": self.on_headers_finished,
+                "on_part_data": self.on_part_data,
+                "on_part_end": self.on_part_end,
+                "on_end": self.on_end,
+            },
+        )
+
+    def on_part_begin(self):
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[bytes(self.header_field).lower()] = bytes(self.header_value)
+        self.header_field.clear()
+        self.header_value.clear()
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition"))
+        if (
+            self.filename is None
+            and options.get(b"name") == self.field
+            and b"filename" in options
+        ):
+            self.selected = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            content_type = self.headers.get(b"content-type")
+            self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.selected:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self):
+        self.selected = False
+
+    def on_end(self):
+        self.ended = True
+
+    async def feed(self):
+        try:
+            chunk = await self.body.__anext__()
+        except StopAsyncIteration:
+            self.exhausted = True
+            if not self.ended:
+                raise InvalidUploadError from None
+            return
+        try:
+            self.parser.write(chunk)
+        except MultipartParseError:
+            raise InvalidUploadError from None
+
+    async def start(self):
+        # Reads up to the end of the file part's headers so its name and
+        # content type are known before anything is stored
+        while self.filename is None:
+            if self.exhausted:
+                raise InvalidUploadError
+            await self.feed()
+
+    async def chunks(self):
+        while True:
+            if self.pending:
+                chunk = b"".join(self.pending)
+                self.pending.clear()
+                yield chunk
+            if self.exhausted:
+                return
+            await self.feed()
+
+
+async def limit_size(chunks: AsyncIterator[bytes], max_size: int):
+    # Fails the write as soon as the limit is crossed instead of after the
+    # whole file has been stored
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_size:
+            raise BlobTooLargeError
+        yield chunk
+
+
+async def hash_chunks(chunks: AsyncIterator[bytes], digest):
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    async def write(
+        self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None
+    ) -> int:
+        ...
+
+    @abstractmethod
+    def read(
+        self, key: str, start: int = 0, length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        ...
+
+    @abstractmethod
+    async def move(self, source: str, key: str):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def write(
+        self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None
+    ) -> int:
+        path = self.path(key)
+        partial = f"{path}.partial"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = 0
+        try:
+            async with await anyio.open_file(partial, "wb") as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+                    size += len(chunk)
+            os.replace(partial, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(partial)
+            raise
+        return size
+
+    async def read(self, key: str, start: int = 0, length: Optional[int] = None):
+        async with await anyio.open_file(self.path(key), "rb") as f:
+            await f.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                size = settings.blob_chunk_size
+                if remaining is not None:
+                    size = min(size, remaining)
+                    remaining -= size
+                chunk = await f.read(size)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def move(self, source: str, key: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.path(source), path)
+
+    async def delete(self, key: str):
+        with suppress(FileNotFoundError):
+            os.remove(self.path(key))
+
+
+class S3BlobStore(BlobStore):
+    def __init__(self, bucket: str, **client_options):
+        self.bucket = bucket
+        self.session = get_session()
+        self.client_options = client_options
+
+    def client(self):
+        # aiobotocore clients are bound to the event loop that opened them
+        return self.session.create_client("s3", **self.client_options)
+
+    async def write(
+        self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None
+    ) -> int:
+        options = {"Bucket": self.bucket, "Key": key}
+        extra = {"ContentType": content_type} if content_type else {}
+        # At most one part is buffered; files smaller than a part go up in a
+        # single PUT
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        parts = []
+        async with self.client() as client:
+
+            async def upload_part():
+                number = len(parts) + 1
+                part = await client.upload_part(
+                    **options,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=bytes(buffer),
+                )
+                parts.append({"ETag": part["ETag"], "PartNumber": number})
+                buffer.clear()
+
+            try:
+                async for chunk in chunks:
+                    buffer += chunk
+                    size += len(chunk)
+                    if len(buffer) >= settings.blob_part_size:
+                        if upload_id is None:
+                            upload = await client.create_multipart_upload(
+                                **options, **extra
+                            )
+                            upload_id = upload["UploadId"]
+                        await upload_part()
+                if upload_id is None:
+                    await client.put_object(**options, Body=bytes(buffer), **extra)
+                    return size
+                if buffer:
+                    await upload_part()
+                await client.complete_multipart_upload(
+                    **options, UploadId=upload_id, MultipartUpload={"Parts": parts}
+                )
+            except Exception:
+                if upload_id is not None:
+                    await client.abort_multipart_upload(**options, UploadId=upload_id)
+                raise
+        return size
+
+    async def read(self, key: str, start: int = 0, length: Optional[int] = None):
+        options = {"Bucket": self.bucket, "Key": key}
+        if start or length is not None:
+            end = "" if length is None else start + length - 1
+            options["Range"] = f"bytes={start}-{end}"
+        async with self.client() as client:
+            try:
+                response = await client.get_object(**options)
+            except client.exceptions.NoSuchKey:
+                raise FileNotFoundError(key) from None
+            async with response["Body"] as body:
+                while chunk := await body.read(settings.blob_chunk_size):
+                    yield chunk
+
+    async def move(self, source: str, key: str):
+        async with self.client() as client:
+            await client.copy_object(
+                Bucket=self.bucket,
+                Key=key,
+                CopySource={"Bucket": self.bucket, "Key": source},
+            )
+            await client.delete_object(Bucket=self.bucket, Key=source)
+
+    async def delete(self, key: str):
+        async with self.client() as client:
+            await client.delete_object(Bucket=self.bucket, Key=key)
+
+
+@lru_cache
+def get_blob_store() -> BlobStore:
+    if settings.blob_store == "s3":
+        return S3BlobStore(
+            settings.s3_bucket,
+            endpoint_url=settings.s3_endpoint_url,
+            region_name=settings.s3_region,
+            aws_access_key_id=settings.s3_access_key_id,
+            aws_secret_access_key=settings.s3_secret_access_key,
+        )
+    return LocalBlobStore(settings.blob_local_path)
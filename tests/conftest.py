@@ -1,26 +1,52 @@
+import asyncio
+from contextlib import suppress
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
+from redis.exceptions import RedisError
 from src.config import settings
-from src.database import Base, get_db
+from src.database import Base, RoutingSession, create_db_engine, database_url, get_db
 from src.dtos import dto_users
 from src.handler.utils import create_access_token
 from src.main import app
 from src.models import tasks, users
+from src.redis import redis_client
+from src.storage import get_blob_store
 
-SQLALCHEMY_DATABASE_URL = f"postgresql+psycopg2://{settings.db_username}:{settings.db_password}@{settings.db_hostname}:{settings.db_port}/{settings.db_name}_test"
+TEST_DATABASE_NAME = f"{settings.db_name}_test"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    database_url(driver="psycopg2", database_name=TEST_DATABASE_NAME),
+    poolclass=NullPool,
+)
 
 TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs each request on its own event loop, so connections are not pooled
+async_engine = create_db_engine(
+    database_url(database_name=TEST_DATABASE_NAME), poolclass=NullPool
+)
+
+TestAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 
 @pytest.fixture
 def session():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    # ids restart with the tables, so cached reads must not outlive them
+    with suppress(RedisError):
+        redis_client.flushdb()
     db = TestSessionLocal()
     try:
         yield db
@@ -30,11 +56,9 @@ def session():
 
 @pytest.fixture
 def client(session):
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with TestAsyncSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
     yield TestClient(app)
@@ -97,6 +121,48 @@ def test_task(test_user, session):
     task_map = map(create_task, tasks_data)
     task = list(task_map)
     session.add_all(task)
+    session.query(users.User).filter(users.User.id == test_user.id).update(
+        {"task_count": users.User.task_count + len(task)}
+    )
     session.commit()
     taskslist = session.query(tasks.Task).all()
     return taskslist
+
+
+@pytest.fixture(autouse=True)
+def blob_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_store", "local")
+    monkeypatch.setattr(settings, "blob_local_path", str(tmp_path / "blobs"))
+    get_blob_store.cache_clear()
+    yield get_blob_store()
+    get_blob_store.cache_clear()
+
+
+@pytest.fixture(scope="session")
+def s3_server():
+    # moto comes from requirements/test.txt; imported here so the rest of the
+    # suite still collects without it
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def s3_blob_store(s3_server, blob_store, monkeypatch):
+    monkeypatch.setattr(settings, "blob_store", "s3")
+    monkeypatch.setattr(settings, "s3_endpoint_url", s3_server)
+    monkeypatch.setattr(settings, "s3_access_key_id", "test")
+    monkeypatch.setattr(settings, "s3_secret_access_key", "test")
+    get_blob_store.cache_clear()
+
+    async def create_bucket():
+        async with get_blob_store().client() as client:
+            with suppress(client.exceptions.BucketAlreadyOwnedByYou):
+                await client.create_bucket(Bucket=settings.s3_bucket)
+
+    asyncio.run(create_bucket())
+    return get_blob_store()
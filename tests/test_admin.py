@@ -0,0 +1,22 @@
+from src.config import settings
+
+
+def test_sql_profile_forbidden(authorized_client):
+    response = authorized_client.get("/admin/sql-profile")
+    assert response.status_code == 403
+
+
+def test_sql_profile(authorized_client, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "admin_emails", [test_user.email])
+    authorized_client.get("/tasks/", headers={settings.sql_profile_header: "1"})
+    response = authorized_client.get("/admin/sql-profile")
+    assert response.status_code == 200
+    routes = {route["route"]: route for route in response.json()["data"]["routes"]}
+    assert routes["GET /tasks/"]["query_count"] > 0
+
+
+def test_db_pool(authorized_client, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "admin_emails", [test_user.email])
+    response = authorized_client.get("/admin/db-pool")
+    assert response.status_code == 200
+    assert response.json()["data"]["size"] == settings.db_pool_size
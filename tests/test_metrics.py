@@ -0,0 +1,9 @@
+def test_metrics(client):
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/",status_code="200"}'
+        in response.text
+    )
+    assert "db_pool_checkouts_total" in response.text
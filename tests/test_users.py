@@ -1,3 +1,5 @@
+import logging
+
 import pytest
 from jose import jwt
 
@@ -11,6 +13,63 @@ def test_root(client):
     assert response.status_code == 200
 
 
+def test_sampled_logging_passes_response_through(client, monkeypatch):
+    monkeypatch.setattr(settings, "request_log_sample_rate", 1.0)
+    monkeypatch.setattr(settings, "request_log_max_body_bytes", 8)
+    response = client.get("/")
+    assert response.json().get("message") == "Testing"
+    assert response.headers["content-length"] == str(len(response.content))
+
+
+def logged_bodies(caplog):
+    return [
+        record.getMessage()
+        for record in caplog.records
+        if record.getMessage().startswith(("Request Body", "Response Body"))
+    ]
+
+
+def test_sampled_logging_captures_bodies(client, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "request_log_sample_rate", 1.0)
+    monkeypatch.setattr(settings, "request_log_max_body_bytes", 8)
+    with caplog.at_level(logging.INFO, logger="src"):
+        response = client.post(
+            "/users/", json={"email": "yahya.todolist@gmail.com", "password": "hello"}
+        )
+    sent = response.request.content
+    received = response.content
+    assert logged_bodies(caplog) == [
+        f"Request Body: {sent[:8]} ... ({len(sent) - 8} more bytes)",
+        f"Response Body: {received[:8]} ... ({len(received) - 8} more bytes)",
+    ]
+
+
+def test_sampled_logging_under_cap(client, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "request_log_sample_rate", 1.0)
+    with caplog.at_level(logging.INFO, logger="src"):
+        response = client.get("/")
+    assert logged_bodies(caplog) == [f"Response Body: {response.content}"]
+
+
+def test_unsampled_logging_skips_bodies(client, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "request_log_sample_rate", 0.0)
+    with caplog.at_level(logging.INFO, logger="src"):
+        client.post(
+            "/users/", json={"email": "yahya.todolist@gmail.com", "password": "hello"}
+        )
+    assert logged_bodies(caplog) == []
+
+
+def test_sampled_logging_skips_streaming_response(
+    authorized_client, caplog, monkeypatch
+):
+    monkeypatch.setattr(settings, "request_log_sample_rate", 1.0)
+    with caplog.at_level(logging.INFO, logger="src"):
+        response = authorized_client.get("/tasks/export", params={"format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    assert logged_bodies(caplog) == []
+
+
 def test_create_user(client):
     response = client.post(
         "/users/", json={"email": "yahya.todolist@gmail.com", "password": "hello"}
@@ -22,6 +81,16 @@ def test_create_user(client):
     assert response.status_code == 201
 
 
+def test_create_user_idempotent(client):
+    user_data = {"email": "yahya.todolist@gmail.com", "password": "hello"}
+    headers = {"Idempotency-Key": "register"}
+    first = client.post("/users/", json=user_data, headers=headers)
+    second = client.post("/users/", json=user_data, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
 def test_update_user(authorized_client, test_user):
     response = authorized_client.put(
         f"/users/{test_user.id}/",